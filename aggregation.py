@@ -0,0 +1,89 @@
+import numpy as np
+
+# Number of rows binned at a time, so that binning memory mapped results doesn't read them into memory all at once
+CHUNK_SIZE = 1 << 20
+
+def get_bin_edges(low, high, num_bins):
+    """
+    Returns the edges of num_bins equal width bins from low to high.
+    """
+    if high <= low:
+        high = low + 1
+    return np.linspace(low, high, num_bins + 1)
+
+def get_integer_bin_edges(values, max_bins):
+    """
+    Returns the edges of at most max_bins bins of equal integer width covering the integer values, with every edge
+    halfway between two integers so that no value lies on an edge.
+    """
+    low = int(values.min()) if len(values) else 0
+    high = int(values.max()) if len(values) else 0
+    width = max(1, -(-(high - low + 1) // max_bins))
+    return np.arange(low, high + width + 1, width) - 0.5
+
+def get_bin_indices(values, edges):
+    """
+    Returns the index of the bin of every value. Values outside the edges go into the first or last bin.
+    """
+    return np.clip(np.searchsorted(edges, values, side="right") - 1, 0, len(edges) - 2)
+
+def get_bin_centers(edges):
+    return (edges[:-1] + edges[1:]) / 2
+
+def histogram_2d(x, y, x_edges, y_edges):
+    """
+    Returns a (len(x_edges) - 1) x (len(y_edges) - 1) array with the number of (x, y) points in every bin.
+    """
+    counts = np.zeros((len(x_edges) - 1, len(y_edges) - 1), dtype=np.int64)
+    for start in range(0, len(x), CHUNK_SIZE):
+        x_bins = get_bin_indices(np.asarray(x[start:start+CHUNK_SIZE]), x_edges)
+        y_bins = get_bin_indices(np.asarray(y[start:start+CHUNK_SIZE]), y_edges)
+        counts += np.bincount(x_bins * counts.shape[1] + y_bins, minlength=counts.size).reshape(counts.shape)
+    return counts
+
+def binned_means_2d(x, y, z, x_edges, y_edges):
+    """
+    Returns the number of points and the mean of z over the points in every (x, y) bin, as two arrays shaped like the
+    result of histogram_2d. The mean of an empty bin is nan.
+    """
+    shape = (len(x_edges) - 1, len(y_edges) - 1)
+    counts = np.zeros(shape[0] * shape[1], dtype=np.int64)
+    sums = np.zeros(shape[0] * shape[1])
+    for start in range(0, len(x), CHUNK_SIZE):
+        bins = (get_bin_indices(np.asarray(x[start:start+CHUNK_SIZE]), x_edges) * shape[1]
+                + get_bin_indices(np.asarray(y[start:start+CHUNK_SIZE]), y_edges))
+        counts += np.bincount(bins, minlength=counts.size)
+        sums += np.bincount(bins, weights=np.asarray(z[start:start+CHUNK_SIZE], dtype=float), minlength=sums.size)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = sums / counts
+    return counts.reshape(shape), means.reshape(shape)
+
+def binned_quantiles(x, y, edges, quantiles, max_centroids=200):
+    """
+    Returns the number of points in every bin of x, and a len(quantiles) x (len(edges) - 1) array with the quantiles of
+    y over the points in every bin. The quantiles of an empty bin are nan.
+
+    The points are read in chunks into a QuantileSketch per bin (see online_stats.py), so memory mapped results are
+    never read into memory all at once. The quantiles of a bin with at most max_centroids distinct values of y, such as
+    the integer results of a simulation, are exactly those of np.quantile, and otherwise off by at most about
+    1 / max_centroids in rank.
+    """
+    # online_stats imports this module, so it is imported here rather than at the top
+    from online_stats import QuantileSketch
+    sketches = [QuantileSketch(max_centroids) for _ in range(len(edges) - 1)]
+    for start in range(0, len(x), CHUNK_SIZE):
+        bins = get_bin_indices(np.asarray(x[start:start+CHUNK_SIZE]), edges)
+        y_chunk = np.asarray(y[start:start+CHUNK_SIZE], dtype=float)
+        # Sorting by bin puts the values of every bin next to each other
+        order = np.argsort(bins, kind="stable")
+        chunk_counts = np.bincount(bins, minlength=len(sketches))
+        for bin_index, values in enumerate(np.split(y_chunk[order], np.cumsum(chunk_counts)[:-1])):
+            if len(values):
+                sketches[bin_index].add(values)
+
+    counts = np.array([int(sketch.count()) for sketch in sketches], dtype=np.int64)
+    result = np.full((len(quantiles), len(sketches)), np.nan)
+    for bin_index, sketch in enumerate(sketches):
+        if counts[bin_index]:
+            result[:, bin_index] = sketch.quantile(quantiles)
+    return counts, result
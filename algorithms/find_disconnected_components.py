@@ -1,21 +1,83 @@
+import numpy as np
+from topologies.compact_graph import get_adjacency
+
 def find_num_components(G):
     """
     Returns the number of disconnected components in a graph.
-    G is the graph in an adjacenecy matrix.
+    G is the graph in an adjacenecy matrix or a CompactGraph.
     """
+    adjacency = get_adjacency(G)
     visited = [False for i in range(len(G))]
     num_components = 0
     
-    def dfs(current_node):
-        visited[current_node] = True
+    def dfs(start_node):
+        visited[start_node] = True
+        stack = [start_node]
+        while stack:
+            current_node = stack.pop()
+            for i, _, _ in adjacency[current_node]:
+                if not visited[i]:
+                    visited[i] = True
+                    stack.append(i)
     
-        for i in range(len(G)):
-            if G[current_node][i] > 0 and (not visited[i]):
-                dfs(i)
+    for next_node in range(len(G)):
+        if not visited[next_node]:
+            num_components += 1
+            dfs(next_node)
     
-    while False in visited:
-        num_components += 1
-        next_node = visited.index(False)
-        dfs(next_node)
-    
-    return num_components
\ No newline at end of file
+    return num_components
+
+
+def find_num_components_sweep(G, order):
+    """
+    Returns a list where entry k is the number of disconnected components in G when only the first k links of order
+    are present, for every k from 0 to len(order). The links are added one at a time and merged with a union-find,
+    so the whole list costs about as much as a single call to find_num_components.
+    G is the graph in a CompactGraph and order is a sequence of indices into its edge arrays.
+    """
+    rows = G.rows.tolist()
+    cols = G.cols.tolist()
+    parent = list(range(len(G)))
+    size = [1] * len(G)
+    num_components = len(G)
+    num_components_after = [num_components]
+
+    def find(node):
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    for edge in order:
+        root_i, root_j = find(rows[edge]), find(cols[edge])
+        if root_i != root_j:
+            if size[root_i] < size[root_j]:
+                root_i, root_j = root_j, root_i
+            parent[root_j] = root_i
+            size[root_i] += size[root_j]
+            num_components -= 1
+        num_components_after.append(num_components)
+
+    return num_components_after
+
+def expected_num_components(G, link_failure_rates, num_permutations, rng):
+    """
+    Returns the expected number of disconnected components in G for every given link failure rate, where each link
+    fails independently with that rate. Every random order of the links gives the number of components for every
+    number of surviving links at once, so the whole curve only needs num_permutations calls to
+    find_num_components_sweep. The number of surviving links at rate p is binomially distributed with n = number of
+    links and 1 - p.
+    G is the graph in a CompactGraph.
+    """
+    from scipy.stats import binom
+
+    num_edges = G.num_edges()
+    mean_components = np.zeros(num_edges + 1)
+    for _ in range(num_permutations):
+        mean_components += find_num_components_sweep(G, rng.permutation(num_edges))
+    mean_components /= num_permutations
+
+    surviving_links = np.arange(num_edges + 1)
+    link_failure_rates = np.asarray(link_failure_rates, dtype=float)
+    weights = binom.pmf(surviving_links[np.newaxis, :], num_edges, 1 - link_failure_rates[:, np.newaxis])
+    return weights @ mean_components
@@ -0,0 +1,114 @@
+from algorithms.max_flow import construct_residual, dinic, get_source_side
+from topologies.compact_graph import get_adjacency
+
+def gomory_hu_tree(G):
+    """
+    Returns the Gomory-Hu tree of a graph, built with Gusfield's algorithm from n - 1 maximum flows, as two lists:
+    parent[v] is the neighbor of node v towards node 0 in the tree and weight[v] is the weight of the link between them,
+    which is the maximum flow between v and parent[v]. Node 0 is the root, with a parent of -1 and a weight of 0.
+
+    The maximum flow between any two nodes is the smallest weight on the path between them in the tree, see
+    tree_max_flow.
+    G is the graph in an adjacenecy matrix or a CompactGraph.
+
+    source for Gusfield's algorithm:
+        https://doi.org/10.1137/0219009
+    """
+    n = len(G)
+    arcs, to, capacity = construct_residual(get_adjacency(G))
+    parent = [0] * n
+    weight = [0] * n
+    for s in range(1, n):
+        t = parent[s]
+        # Every flow starts from the same capacities, so the residual graph is only built once
+        residual = capacity.copy()
+        flow = dinic(arcs, to, residual, s, t)
+        source_side = get_source_side(arcs, to, residual, s)
+
+        weight[s] = flow
+        for v in range(n):
+            if v != s and source_side[v] and parent[v] == t:
+                parent[v] = s
+        if source_side[parent[t]]:
+            parent[s] = parent[t]
+            parent[t] = s
+            weight[s] = weight[t]
+            weight[t] = flow
+    parent[0] = -1
+    weight[0] = 0
+    return parent, weight
+
+def tree_max_flow(parent, weight, u, v):
+    """
+    Returns the maximum flow between u and v from a Gomory-Hu tree given by its parent and weight lists, by walking up
+    the tree from both nodes to where their paths meet. This takes O(n) time. The maximum flow from a node to itself
+    is taken to be 0, the same as on the diagonal of all_pairs_max_flow, since no flow leaves the node.
+    """
+    if u == v:
+        return 0
+    ancestors = {}
+    node, smallest = u, float('inf')
+    while node != -1:
+        ancestors[node] = smallest
+        smallest = min(smallest, weight[node])
+        node = parent[node]
+    node, smallest = v, float('inf')
+    while node not in ancestors:
+        smallest = min(smallest, weight[node])
+        node = parent[node]
+    return min(smallest, ancestors[node])
+
+def all_pairs_max_flow(parent, weight):
+    """
+    Returns an n x n list of the maximum flow between every pair of nodes from a Gomory-Hu tree, with 0 on the diagonal
+    like tree_max_flow.
+    """
+    n = len(parent)
+    neighbors = [[] for _ in range(n)]
+    for v in range(n):
+        if parent[v] >= 0:
+            neighbors[v].append((parent[v], weight[v]))
+            neighbors[parent[v]].append((v, weight[v]))
+
+    flows = []
+    for source in range(n):
+        row = [0] * n
+        visited = [False] * n
+        visited[source] = True
+        stack = [(source, float('inf'))]
+        while stack:
+            u, smallest = stack.pop()
+            for v, w in neighbors[u]:
+                if not visited[v]:
+                    visited[v] = True
+                    row[v] = min(smallest, w)
+                    stack.append((v, row[v]))
+        flows.append(row)
+    return flows
+
+def max_flow_distribution(parent, weight):
+    """
+    Returns a dictionary mapping every maximum flow value to the number of pairs of nodes with that maximum flow, from
+    a Gomory-Hu tree. Adding the tree links from the heaviest to the lightest with a union-find, a link joining
+    components of a and b nodes is the lightest link on the path of exactly a * b new pairs, so this takes
+    O(n log n) time instead of O(n^2).
+    """
+    n = len(parent)
+    component = list(range(n))
+    size = [1] * n
+
+    def find(node):
+        while component[node] != node:
+            component[node] = component[component[node]]
+            node = component[node]
+        return node
+
+    distribution = {}
+    for v in sorted((v for v in range(n) if parent[v] >= 0), key=lambda v: weight[v], reverse=True):
+        a, b = find(v), find(parent[v])
+        distribution[weight[v]] = distribution.get(weight[v], 0) + size[a] * size[b]
+        if size[a] < size[b]:
+            a, b = b, a
+        component[b] = a
+        size[a] += size[b]
+    return distribution
@@ -1,100 +1,238 @@
+import numpy as np
+from collections import deque
+from topologies.compact_graph import get_adjacency
+
+# WarmStartMaxFlow starts from zero flow instead once more than this fraction of the links carrying flow have failed,
+# since cancelling that much flow costs more than finding the flow again
+MAX_WARM_START_FAILED_FRACTION = 0.25
+
 def max_flow(G, source, sink):
     """
-    Returns the maximum flow generated by the Ford-Fulkerson algorithm.
-    G is the graph in an adjacenecy matrix.
-    """
-    n = len(G)
-    # Remove self loops
-    modified_graph = [[G[i][j] if i != j else 0 for j in range(n)] for i in range(n)]
-
-    # Remove edges going into source and edges going out of sink
-    for i in range(n):
-        modified_graph[i][source] = 0
-        modified_graph[sink][i] = 0
-
-    # Construct capacities (weight of each edge)
-    capacities = {}
-    for u in range(n):
-        for v in range(n):
-            if modified_graph[u][v] != 0:
-                capacities[(u, v)] = modified_graph[u][v]
-
-    # Run Ford-Fulkerson and return the flow out of the source
-    max_flow = ford_fulkerson(modified_graph, source, sink, capacities)
-    flow_generated = 0
-    for u, _ in max_flow:
-        if u == source:
-            flow_generated += max_flow[(u, _)]
-    return flow_generated
-
-def construct_residual(n, flow, capacities):
-    """
-    Constructs the residual graph of a flow network
-    """
-    residual_graph = [[0 for _ in range(n)] for _ in range(n)]
-    for u in range(n):
-        for v in range(n):
-            if (u, v) in capacities and flow[(u, v)] < capacities[(u, v)]:
-                residual_graph[u][v] = capacities[(u, v)] - flow[(u, v)]
-
-    return residual_graph
-
-def augment(flow, capacities, path):
-    """
-    Augments the flow along a path in a flow network
-    """
-    min_flow = float('inf')
-    for i in range(len(path)-1):
-        u, v = path[i], path[i+1]
-        min_flow = min(min_flow, capacities[(u, v)] - flow[(u, v)])
-    for i in range(len(path)-1):
-        u, v = path[i], path[i+1]
-        flow[(u, v)] += min_flow
-        flow[(v, u)] = -flow[(u, v)]
-    return flow
+    Returns the maximum flow generated by Dinic's algorithm.
+    G is the graph in an adjacenecy matrix or a CompactGraph.
+    """
+    arcs, to, residual = construct_residual(get_adjacency(G))
+    return dinic(arcs, to, residual, source, sink)
 
-def ford_fulkerson(G, s, t, capacities):
+def min_cut(G, source, sink):
+    """
+    Returns the value of the maximum flow from source to sink and the source side of a minimum cut, as a list holding
+    True for every node on the same side of the cut as source.
+    G is the graph in an adjacenecy matrix or a CompactGraph.
     """
-    Runs the Ford-Fulkerson algorithm on a flow network and returns the flow
+    arcs, to, residual = construct_residual(get_adjacency(G))
+    flow = dinic(arcs, to, residual, source, sink)
+    return flow, get_source_side(arcs, to, residual, source)
 
-    source for Ford-Fulkerson on undirected graphs:
+def get_source_side(arcs, to, residual, source):
+    """
+    Returns a list holding True for every node that can be reached from source in a residual graph. After a maximum
+    flow, these nodes are the source side of a minimum cut.
+    """
+    # With source as the target as well, bfs_levels always returns the levels of every node it reaches
+    level = bfs_levels(arcs, to, residual, source, source)
+    return [node_level >= 0 for node_level in level]
+
+def construct_residual(adjacency):
+    """
+    Constructs the residual graph of an undirected flow network as arrays. Every link is split into a pair of arcs, one
+    per direction, that are each other's reverse: arc e goes to to[e], has residual capacity residual[e] and its reverse
+    is arc e ^ 1. arcs[u] holds the arcs leaving node u.
+
+    source for max flow on undirected graphs:
         https://www.inf.ufpr.br/elias/papers/2004/RT_DINF003_2004.pdf 
     """
-    n = len(G)
-    flow = {}
-    # Initialize all flows to 0
-    for i in range(n):
-        for j in range(n):
-            if G[i][j] != 0:
-                flow[(i, j)] = 0
-    residual_graph = construct_residual(n, flow, capacities)
-    while (path := dfs(residual_graph, s, t)) is not None:
-        flow = augment(flow, capacities, path)
-        residual_graph = construct_residual(n, flow, capacities)
+    arcs = [[] for _ in range(len(adjacency))]
+    to = []
+    residual = []
+    for u in range(len(adjacency)):
+        for v, weight, _ in adjacency[u]:
+            if u < v:
+                arcs[u].append(len(to))
+                to.append(v)
+                residual.append(weight)
+                arcs[v].append(len(to))
+                to.append(u)
+                residual.append(weight)
+    return arcs, to, residual
+
+def dinic(arcs, to, residual, s, t):
+    """
+    Runs Dinic's algorithm on a residual graph built by construct_residual and returns the value of the maximum flow.
+    The residual capacities are updated in place.
+    """
+    flow = 0
+    while (level := bfs_levels(arcs, to, residual, s, t)) is not None:
+        # Index of the next arc to try for every node, arcs before it are saturated or lead to a dead end in this phase
+        current = [0] * len(arcs)
+        while (path := find_augmenting_path(arcs, to, residual, level, current, s, t)) is not None:
+            bottleneck = min(residual[e] for e in path)
+            for e in path:
+                residual[e] -= bottleneck
+                residual[e ^ 1] += bottleneck
+            flow += bottleneck
     return flow
 
-def dfs(G, s, t):
+def bfs_levels(arcs, to, residual, s, t):
     """
-    Returns a path from s to t in G if one exists, None otherwise
+    Returns the distance from s of every node in the residual graph, or None if t can't be reached from s
+    """
+    level = [-1] * len(arcs)
+    level[s] = 0
+    queue = deque([s])
+    while queue:
+        u = queue.popleft()
+        for e in arcs[u]:
+            v = to[e]
+            if residual[e] > 0 and level[v] < 0:
+                level[v] = level[u] + 1
+                queue.append(v)
+    return level if level[t] >= 0 else None
+
+def find_augmenting_path(arcs, to, residual, level, current, s, t):
+    """
+    Returns the arcs of a path from s to t that only moves one level further from s at every step, None if there
+    is no such path left
     """
-    visited = [i == s for i in range(len(G))]
-    stack = [s]
     path = []
-    parent = {}
-    while stack:
-        u = stack.pop()
-        for v in range(len(G)):
-            if G[u][v] != 0 and not visited[v]:
-                stack.append(v)
-                visited[v] = True
-                parent[v] = u
-                if v == t:
-                    break
-    if t in parent:
-        while t != s:
-            path.append(t)
-            t = parent[t]
-        path.append(s)
-        path.reverse()
-        return path
-    return None
+    u = s
+    while u != t:
+        node_arcs = arcs[u]
+        while current[u] < len(node_arcs):
+            e = node_arcs[current[u]]
+            if residual[e] > 0 and level[to[e]] == level[u] + 1:
+                break
+            current[u] += 1
+        else:
+            # u is a dead end, so step back and skip the arc that led to it
+            if u == s:
+                return None
+            e = path.pop()
+            u = to[e ^ 1]
+            current[u] += 1
+            continue
+        path.append(e)
+        u = to[e]
+    return path
+
+
+class WarmStartMaxFlow():
+    """
+    A class to represent the maximum flow between a source and a sink on copies of a base graph that only lose links,
+    such as the failure views of a topology. The maximum flow of the intact base graph is found once. The flow of a
+    damaged copy starts from it: only the flow on the failed links is cancelled, by sending it back along the paths it
+    came from, and the partial flow is then augmented with Dinic's algorithm. If no failed link carries flow, the base
+    flow is still a maximum flow and is returned right away. If too many of the links carrying flow have failed, the
+    flow is found from zero instead.
+    G is the base graph in a CompactGraph.
+    """
+
+    def __init__(self, G, source, sink) -> None:
+        self.source = source
+        self.sink = sink
+        self.arcs, self.to, capacity = construct_link_residual(G)
+        if G.alive is not None:
+            for link in np.flatnonzero(~G.alive).tolist():
+                capacity[2 * link] = capacity[2 * link + 1] = 0
+        self.capacity = capacity
+        self.residual = capacity.copy()
+        self.value = dinic(self.arcs, self.to, self.residual, source, sink)
+
+        # Net flow of every link from rows[k] to cols[k], negative if it flows the other way
+        residual = np.array(self.residual)
+        self.link_flow = (residual[1::2] - residual[0::2]) // 2
+
+    def max_flow(self, failed):
+        """
+        Returns the maximum flow from source to sink once the links selected by the failure mask are removed from the
+        base graph.
+        """
+        failed_links = np.flatnonzero(np.asarray(failed, dtype=bool) & (self.link_flow != 0))
+        if len(failed_links) == 0:
+            return self.value
+
+        cold_start = len(failed_links) > MAX_WARM_START_FAILED_FRACTION * np.count_nonzero(self.link_flow)
+        residual = self.capacity.copy() if cold_start else self.residual.copy()
+        for link in np.flatnonzero(failed).tolist():
+            residual[2 * link] = residual[2 * link + 1] = 0
+        if cold_start:
+            return dinic(self.arcs, self.to, residual, self.source, self.sink)
+
+        excess = [0] * len(self.arcs)
+        for link in failed_links.tolist():
+            flow = int(self.link_flow[link])
+            # The arc the flow went along, from u to v
+            e = 2 * link if flow > 0 else 2 * link + 1
+            u, v = self.to[e ^ 1], self.to[e]
+            excess[u] += abs(flow)
+            excess[v] -= abs(flow)
+        excess[self.source] = excess[self.sink] = 0
+
+        for u in range(len(excess)):
+            while excess[u] > 0:
+                excess[u] -= self.cancel_flow(residual, excess, u, backward=True)
+        for v in range(len(excess)):
+            while excess[v] < 0:
+                excess[v] += self.cancel_flow(residual, excess, v, backward=False)
+
+        value = sum((residual[e ^ 1] - residual[e]) // 2 for e in self.arcs[self.source])
+        return value + dinic(self.arcs, self.to, residual, self.source, self.sink)
+
+    def cancel_flow(self, residual, excess, start, backward):
+        """
+        Cancels flow along a path that carries flow, to remove the excess (inflow above outflow) or the deficit of a
+        node left by the failed links. An excess is sent back against the flow to the source or to a node with a
+        deficit, and a deficit is made up by following the flow to the sink. Returns the amount cancelled.
+        """
+        # An arc e carries flow into its tail if residual[e] > residual[e ^ 1], and out of its tail if it is smaller
+        direction = 1 if backward else -1
+        previous = {start: None}
+        queue = deque([start])
+        end = None
+        while queue:
+            u = queue.popleft()
+            if u != start and (u == self.source or excess[u] < 0 if backward else u == self.sink or excess[u] > 0):
+                end = u
+                break
+            for e in self.arcs[u]:
+                v = self.to[e]
+                if v not in previous and (residual[e] - residual[e ^ 1]) * direction > 0:
+                    previous[v] = e
+                    queue.append(v)
+
+        path = []
+        u = end
+        while u != start:
+            e = previous[u]
+            path.append(e)
+            u = self.to[e ^ 1]
+        amount = min(abs(residual[e] - residual[e ^ 1]) // 2 for e in path)
+        amount = min(amount, abs(excess[start]))
+        if end not in (self.source, self.sink):
+            amount = min(amount, abs(excess[end]))
+            excess[end] += amount if backward else -amount
+        for e in path:
+            # Backward, pushing along e cancels flow coming in over e ^ 1. Forward, pushing along e ^ 1 cancels flow
+            # going out over e.
+            pushed = e if backward else e ^ 1
+            residual[pushed] -= amount
+            residual[pushed ^ 1] += amount
+        return amount
+
+
+def construct_link_residual(G):
+    """
+    Constructs the residual graph of a CompactGraph like construct_residual, but with the arcs of link k numbered 2k,
+    from rows[k] to cols[k], and 2k + 1 the other way, so that flows can be read per link. The alive mask is ignored.
+    """
+    edge_ids = G.edge_ids.astype(np.int64)
+    heads = np.repeat(np.arange(len(G)), np.diff(G.indptr))
+    arc_ids = (2 * edge_ids + (G.rows[edge_ids] != heads)).tolist()
+    indptr = G.indptr.tolist()
+    arcs = [arc_ids[indptr[u]:indptr[u+1]] for u in range(len(G))]
+
+    to = np.empty(2 * G.num_edges(), dtype=np.int64)
+    to[0::2] = G.cols
+    to[1::2] = G.rows
+    residual = np.repeat(G.weights.astype(np.int64), 2)
+    return arcs, to.tolist(), residual.tolist()
@@ -1,57 +1,201 @@
 import heapq
+import numpy as np
+from topologies.compact_graph import get_adjacency
 
 def shortest_path(G, source, dest):
     """
-    Returns the number of shortest between between a source and sink in a graph.
-    G is the graph in an adjacenecy matrix.
+    Returns the shortest path between a source and sink in a graph and its weight.
+    G is the graph in an adjacenecy matrix or a CompactGraph.
+    If dest can't be reached from source, the path is empty and its weight is 0.
     """
-    explored_nodes = []
-    distance = MinHeap()
+    distance, predecessor = dijkstra(G, source, dest)
+    if distance[dest] == float('inf'):
+        return [], 0
+    return get_path(predecessor, source, dest), distance[dest]
+
+def shortest_path_tree(G, source):
+    """
+    Returns the weights of the shortest paths from source to every node in a graph, and the predecessor of every node
+    on its shortest path, which together form the shortest path tree of source. Use get_path to read a path from it.
+    G is the graph in an adjacenecy matrix or a CompactGraph.
+    The weight of a node that can't be reached from source is inf and its predecessor is None.
+    """
+    return dijkstra(G, source)
+
+def dijkstra(G, source, dest=None):
+    """
+    Runs Dijkstra's algorithm from source and returns the distance and predecessor lists. If dest is given, it stops
+    once the shortest path to dest is found, so only the distances of nodes closer than dest are final.
+    """
+    adjacency = get_adjacency(G)
+    visited = [False] * len(G)
+    distance = [float('inf')] * len(G)
     predecessor = [None] * len(G)
+    heap = MinHeap()
 
-    for i in range(len(G)):
-        if i == source:
-            distance.add_node(i, 0)
-        else:
-            distance.add_node(i, float('inf'))
+    distance[source] = 0
+    heap.add_node(source, 0)
 
-    while len(explored_nodes) < len(G):
-        min_d_node = distance.pop_node()
-        explored_nodes.append(min_d_node[1])
-        
-        for node in range(len(G)):
-            if node not in explored_nodes and G[min_d_node[1]][node] != 0:
-                if min_d_node[0] + G[min_d_node[1]][node] < distance.entry_finder[node][0]:
-                    distance.add_node(node, min_d_node[0] + G[min_d_node[1]][node])
-                    predecessor[node] = min_d_node[1]
-    
-    # build path from source to dest
-    path = []
-    curr_node = dest
-    while curr_node != source:
-        path = [curr_node] + path
-        if predecessor[curr_node] == None:
-            path = []
+    while heap:
+        d, u = heap.pop_node()
+        visited[u] = True
+        if u == dest:
             break
-        curr_node = predecessor[curr_node]
-    if path != []:
-        path = [source] + path
+        
+        for node, edge_weight, _ in adjacency[u]:
+            if not visited[node] and d + edge_weight < distance[node]:
+                distance[node] = d + edge_weight
+                predecessor[node] = u
+                heap.add_node(node, distance[node])
+
+    return distance, predecessor
+
+def get_path(predecessor, source, dest):
+    """
+    Returns the path from source to dest in a shortest path tree given by its predecessor list. dest must be reachable.
+    """
+    path = [dest]
+    while path[-1] != source:
+        path.append(predecessor[path[-1]])
+    path.reverse()
+    return path
+
+
+class CachedShortestPathTree():
+    """
+    A class to represent the shortest path tree of a source on a base graph, reused to find shortest paths on copies of
+    the base graph that only lose links, such as the failure views of a topology. Removing links can only make paths
+    longer, so if the path to a destination in the tree has no failed link, it is still a shortest path. Otherwise only
+    the nodes below the first failed link of the tree are affected, and Dijkstra's algorithm is rerun on those nodes
+    alone, starting from the distances of the unaffected nodes around them.
+    G is the base graph in a CompactGraph.
+    """
+
+    def __init__(self, G, source) -> None:
+        self.source = source
+        self.distance, self.predecessor = shortest_path_tree(G, source)
 
-    weight = 0
-    for i in range(len(path)-1):
-        weight += G[path[i]][path[i+1]]
-    
-    return path, weight
+        # Link from every node to its predecessor in the tree, -1 for the source and unreachable nodes
+        adjacency = get_adjacency(G)
+        self.predecessor_link = [-1] * len(G)
+        children = [[] for _ in range(len(G))]
+        for v, u in enumerate(self.predecessor):
+            if u is not None:
+                self.predecessor_link[v] = next(edge_id for node, _, edge_id in adjacency[v] if node == u)
+                children[u].append(v)
+        self.tree_links = np.array(self.predecessor_link)
+        self.tree_nodes = np.flatnonzero(self.tree_links >= 0)
 
+        # Position of every node in a preorder walk of the tree, and the position after its subtree, so that the
+        # subtree of v is every node whose position is in [start[v], end[v])
+        self.start = np.zeros(len(G), dtype=np.int64)
+        self.end = np.zeros(len(G), dtype=np.int64)
+        position = 0
+        stack = [(source, False)]
+        while stack:
+            u, done = stack.pop()
+            if done:
+                self.end[u] = position
+                continue
+            self.start[u] = position
+            position += 1
+            stack.append((u, True))
+            stack.extend((v, False) for v in children[u])
+        self.num_tree_nodes = position
+
+    def path_survives(self, G, dest):
+        """
+        Returns true if the path to dest in the tree has no failed link in G, by walking up the path.
+        """
+        alive = G.alive
+        v = dest
+        while v != self.source:
+            if alive is not None and not alive[self.predecessor_link[v]]:
+                return False
+            v = self.predecessor[v]
+        return True
+
+    def shortest_path(self, G, dest):
+        """
+        Returns the shortest path from the source to dest in G and its weight, like shortest_path. G must be the base
+        graph with some links failed, such as a view made by CompactGraph.with_failures.
+        """
+        if self.distance[dest] == float('inf'):
+            return [], 0
+        if self.path_survives(G, dest):
+            return get_path(self.predecessor, self.source, dest), self.distance[dest]
+        return self.repair(G, dest)
+
+    def get_affected(self, G):
+        """
+        Returns a list holding True for every node below a failed link of the tree.
+        """
+        failed_tree_nodes = self.tree_nodes[~G.alive[self.tree_links[self.tree_nodes]]]
+        # Every failed subtree adds 1 from its start to its end, so the nodes with a positive sum are affected
+        change = np.zeros(self.num_tree_nodes + 1, dtype=np.int64)
+        np.add.at(change, self.start[failed_tree_nodes], 1)
+        np.add.at(change, self.end[failed_tree_nodes], -1)
+        affected_positions = np.cumsum(change[:-1]) > 0
+        affected = np.zeros(len(G), dtype=bool)
+        in_tree = np.isfinite(self.distance)
+        affected[in_tree] = affected_positions[self.start[in_tree]]
+        return affected.tolist()
+
+    def repair(self, G, dest):
+        """
+        Finds the shortest path to dest in G by rerunning Dijkstra's algorithm on the affected nodes only. An affected
+        node starts from its shortest distance through a live link to an unaffected node.
+        """
+        adjacency = get_adjacency(G)
+        affected = self.get_affected(G)
+        distance = {}
+        predecessor = {}
+        heap = MinHeap()
+        for v in range(len(affected)):
+            if affected[v]:
+                best = float('inf')
+                for u, edge_weight, _ in adjacency[v]:
+                    if not affected[u] and self.distance[u] + edge_weight < best:
+                        best = self.distance[u] + edge_weight
+                        predecessor[v] = u
+                distance[v] = best
+                if best < float('inf'):
+                    heap.add_node(v, best)
+
+        visited = set()
+        while heap:
+            d, u = heap.pop_node()
+            visited.add(u)
+            if u == dest:
+                break
+            for node, edge_weight, _ in adjacency[u]:
+                if affected[node] and node not in visited and d + edge_weight < distance[node]:
+                    distance[node] = d + edge_weight
+                    predecessor[node] = u
+                    heap.add_node(node, distance[node])
+
+        if dest not in visited:
+            return [], 0
+        path = [dest]
+        while path[-1] != self.source:
+            u = path[-1]
+            path.append(predecessor[u] if u in predecessor else self.predecessor[u])
+        path.reverse()
+        return path, distance[dest]
 
 class MinHeap():
     """
-    Represents a minimum heap.
+    Represents a minimum heap. Every instance has its own state, so nothing is kept between uses.
     """
-    heap = []
-    entry_finder = {}
     REMOVED = -1
 
+    def __init__(self) -> None:
+        self.heap = []
+        self.entry_finder = {}
+
+    def __len__(self):
+        return len(self.entry_finder)
+
     def add_node(self, node, priority=0):
         """
         Adds a node to the heap.
@@ -0,0 +1,168 @@
+"""
+Benchmarks for the topology generators, the algorithms and the simulation loop.
+
+Run from the root of the repository with:
+    python -m benchmarks.run_benchmarks
+
+Every benchmark reports its throughput (operations or simulations per second) and its peak memory, and is compared
+against the stored baseline in benchmarks/baseline.json. Use --save-baseline to replace the baseline with the results of
+the current run.
+
+The stored baseline was recorded with Python 3.11 and NumPy 2.4 on a single x86_64 core, on the tree that added the
+tests for every part of the simulation. Throughput depends on the machine, so record a baseline with --save-baseline on
+the machine the benchmarks are compared on before looking for regressions.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import time
+import tracemalloc
+import numpy as np
+from algorithms.find_disconnected_components import find_num_components
+from algorithms.max_flow import max_flow
+from algorithms.shortest_path import shortest_path
+from topologies.topology import (FullyConnectedTopology, ConstantTopology, ClusteredTopology)
+from simulation import (FullyConnectedTopologySimulation, ConstantTopologySimulation, ClusteredTopologySimulation)
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+# A benchmark is reported as a regression if its throughput drops below the baseline divided by this factor
+REGRESSION_FACTOR = 1.25
+
+# Link failure rate of the graphs the algorithms are benchmarked on
+LINK_FAILURE_RATE = 0.3
+
+# (name, topology class, constructor parameters) of every topology in the grid, from sparse to dense
+TOPOLOGY_GRID = [
+    ("fully_connected_25", FullyConnectedTopology, (25,)),
+    ("fully_connected_75", FullyConnectedTopology, (75,)),
+    ("fully_connected_150", FullyConnectedTopology, (150,)),
+    ("constant_75_links_4", ConstantTopology, (75, 4)),
+    ("constant_75_links_37", ConstantTopology, (75, 37)),
+    ("constant_150_links_4", ConstantTopology, (150, 4)),
+    ("constant_150_links_75", ConstantTopology, (150, 75)),
+    ("clustered_75_clusters_5", ClusteredTopology, (75, 5)),
+    ("clustered_75_clusters_15", ClusteredTopology, (75, 15)),
+    ("clustered_150_clusters_5", ClusteredTopology, (150, 5)),
+    ("clustered_150_clusters_15", ClusteredTopology, (150, 15)),
+]
+
+# (name, simulation class, constructor parameters) of every end-to-end simulation benchmark
+SIMULATION_GRID = [
+    ("simulate_fully_connected_75", FullyConnectedTopologySimulation, (75,)),
+    ("simulate_fully_connected_150", FullyConnectedTopologySimulation, (150,)),
+    ("simulate_constant_150_links_10", ConstantTopologySimulation, (150, 10)),
+    ("simulate_clustered_150_clusters_10", ClusteredTopologySimulation, (150, 10)),
+    ("simulate_fully_connected_random", FullyConnectedTopologySimulation, (-1,)),
+    ("simulate_constant_random", ConstantTopologySimulation, (-1, 10)),
+    ("simulate_clustered_random", ClusteredTopologySimulation, (-1, 10)),
+]
+
+def measure(run, repeats):
+    """
+    Calls run repeats times and returns the number of calls per second and the peak memory of a single call in KiB.
+    The peak memory is measured in a separate call, since tracing allocations slows the code down.
+    """
+    start_time = time.perf_counter()
+    for _ in range(repeats):
+        run()
+    ops_per_sec = repeats / (time.perf_counter() - start_time)
+
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"ops_per_sec": ops_per_sec, "peak_memory_kib": peak / 1024}
+
+def benchmark_topologies(repeats):
+    """
+    Benchmarks generating every topology in the grid, and each algorithm on damaged copies of it.
+    """
+    results = {}
+    for name, topology_class, params in TOPOLOGY_GRID:
+        rng = np.random.default_rng(0)
+        results["generate_" + name] = measure(lambda: topology_class(*params, rng), repeats)
+
+        graph = topology_class(*params, rng).get_compact_graph()
+        # measure makes repeats + 1 calls. Each call gets a new view of the graph, since a view caches the adjacency
+        # lists the algorithms build on and building them is part of the cost of a simulation.
+        masks = [rng.random(graph.num_edges()) <= LINK_FAILURE_RATE for _ in range(repeats + 1)]
+        sink = len(graph) - 1
+        for algorithm_name, algorithm in [("find_num_components", lambda view: find_num_components(view)),
+                                          ("max_flow", lambda view: max_flow(view, 0, sink)),
+                                          ("shortest_path", lambda view: shortest_path(view, 0, sink))]:
+            views = iter([graph.with_failures(mask) for mask in masks])
+            results[algorithm_name + "_" + name] = measure(lambda: algorithm(next(views)), repeats)
+    return results
+
+def benchmark_simulations(num_sims):
+    """
+    Benchmarks running num_sims simulations end to end for every simulation in the grid. ops_per_sec is the number of
+    simulations per second.
+    """
+    results = {}
+    for name, simulation_class, params in SIMULATION_GRID:
+        def run():
+            simulation = simulation_class(num_sims, *params, seed=0)
+            # Hide the progress bar and runtime that simulate prints
+            with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+                simulation.simulate()
+        result = measure(run, 1)
+        result["ops_per_sec"] *= num_sims
+        results[name] = result
+    return results
+
+def compare(results, baseline):
+    """
+    Prints every result next to its baseline and returns the names of the benchmarks that regressed.
+    """
+    regressions = []
+    print("%-50s %14s %14s %8s %14s" % ("benchmark", "ops/sec", "baseline", "ratio", "peak KiB"))
+    for name, result in results.items():
+        baseline_ops = baseline.get(name, {}).get("ops_per_sec")
+        ratio = result["ops_per_sec"] / baseline_ops if baseline_ops else float("nan")
+        flag = ""
+        if baseline_ops and ratio < 1 / REGRESSION_FACTOR:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print("%-50s %14.1f %14s %8.2f %14.1f%s" % (name, result["ops_per_sec"],
+                                                   "%.1f" % baseline_ops if baseline_ops else "-",
+                                                   ratio, result["peak_memory_kib"], flag))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the topologies, algorithms and simulation loop.")
+    parser.add_argument("--repeats", type=int, default=20, help="calls per topology and algorithm benchmark")
+    parser.add_argument("--num-sims", type=int, default=200, help="simulations per end-to-end benchmark")
+    parser.add_argument("--only", choices=["topologies", "simulations"], help="only run one group of benchmarks")
+    parser.add_argument("--save-baseline", action="store_true", help="store the results as the new baseline")
+    parser.add_argument("--fail-on-regression", action="store_true", help="exit with status 1 if anything regressed")
+    args = parser.parse_args()
+
+    results = {}
+    if args.only != "simulations":
+        results.update(benchmark_topologies(args.repeats))
+    if args.only != "topologies":
+        results.update(benchmark_simulations(args.num_sims))
+
+    baseline = {}
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH) as f:
+            baseline = json.load(f)
+    regressions = compare(results, baseline)
+
+    if args.save_baseline:
+        baseline.update(results)
+        with open(BASELINE_PATH, "w") as f:
+            json.dump(baseline, f, indent=4, sort_keys=True)
+        print("Saved baseline to " + BASELINE_PATH)
+
+    if regressions:
+        print(str(len(regressions)) + " benchmark(s) regressed by more than a factor of " + str(REGRESSION_FACTOR))
+        if args.fail_on_regression:
+            raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
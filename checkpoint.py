@@ -0,0 +1,24 @@
+import json
+import os
+
+CHECKPOINT_FILE = "checkpoint.json"
+
+def write_checkpoint(directory, state):
+    """
+    Stores the state of a simulation run in the given directory. The checkpoint is replaced in one step, so an
+    interruption while writing it leaves the previous checkpoint intact.
+    """
+    temp_path = os.path.join(directory, CHECKPOINT_FILE + ".tmp")
+    with open(temp_path, "w") as f:
+        json.dump(state, f)
+    os.replace(temp_path, os.path.join(directory, CHECKPOINT_FILE))
+
+def read_checkpoint(directory):
+    """
+    Returns the state of a simulation run stored in the given directory by write_checkpoint.
+    """
+    path = os.path.join(directory, CHECKPOINT_FILE)
+    if not os.path.exists(path):
+        raise Exception("No checkpoint found in " + directory)
+    with open(path) as f:
+        return json.load(f)
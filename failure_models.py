@@ -0,0 +1,127 @@
+import numpy as np
+from abc import ABC, abstractmethod
+
+class FailureModel(ABC):
+    """
+    A class to represent how the links of a topology fail in a simulation.
+
+    Every simulation first draws a failure rate from a normal distribution with the given mean and standard deviation,
+    truncated to [low, high] and rounded to the given number of decimals. The model then decides which links fail at
+    that rate. Rates and failures are drawn for a whole batch of simulations at once, and the failures of a batch are
+    returned as a boolean mask with one row per simulation and one column per link in topology.get_edges(), which is
+    True where the link fails.
+    """
+
+    def __init__(self, mean=0.5, sd=0.5, low=0.0, high=1.0, decimals=2) -> None:
+        self.mean = mean
+        self.sd = sd
+        self.low = low
+        self.high = high
+        self.decimals = decimals
+
+    def sample_rates(self, rng, k):
+        """
+        Returns k failure rates drawn from the truncated normal distribution. Normal samples outside [low, high] are
+        rejected, which gives exactly the truncated distribution without building a scipy distribution for every draw.
+        """
+        rates = np.empty(0)
+        while len(rates) < k:
+            # Draw twice as many samples as are missing, since at most about a third are rejected with the defaults
+            samples = rng.normal(self.mean, self.sd, size=2 * (k - len(rates)) + 16)
+            rates = np.concatenate([rates, samples[(samples >= self.low) & (samples <= self.high)]])
+        return np.round(rates[:k], self.decimals)
+
+    def sample_batch(self, topology, k, rng):
+        """
+        Returns the failure rates and failure masks of k simulations on the topology.
+        """
+        rates = self.sample_rates(rng, k)
+        return rates, self.sample_masks(topology, rates, rng)
+
+    @abstractmethod
+    def sample_masks(self, topology, rates, rng):
+        """
+        Returns the failure mask of one simulation on the topology for every given failure rate.
+        """
+        pass
+
+
+class LinkFailureModel(FailureModel):
+    """
+    A failure model where every link fails independently with the failure rate.
+    """
+
+    def sample_masks(self, topology, rates, rng):
+        rows, _ = topology.get_edges()
+        return rng.random((len(rates), len(rows))) <= rates[:, np.newaxis]
+
+
+class NodeFailureModel(FailureModel):
+    """
+    A failure model where every node fails independently with the failure rate, taking all of its links down with it.
+    A failed node stays in the topology as a node without links.
+    """
+
+    def sample_masks(self, topology, rates, rng):
+        rows, cols = topology.get_edges()
+        failed_nodes = rng.random((len(rates), len(topology))) <= rates[:, np.newaxis]
+        return failed_nodes[:, rows] | failed_nodes[:, cols]
+
+
+class ClusterOutageModel(FailureModel):
+    """
+    A failure model for a ClusteredTopology where every cluster fails as a whole with the failure rate, taking down
+    every link of its nodes, including the ring links of its centroid.
+    """
+
+    def sample_masks(self, topology, rates, rng):
+        clusters = get_clusters(topology)
+        rows, cols = topology.get_edges()
+        failed_clusters = rng.random((len(rates), clusters.max() + 1)) <= rates[:, np.newaxis]
+        failed_nodes = failed_clusters[:, clusters]
+        return failed_nodes[:, rows] | failed_nodes[:, cols]
+
+
+class RingCutModel(FailureModel):
+    """
+    A failure model for a ClusteredTopology where every link of the ring between the centroids of the clusters is cut
+    with the failure rate, and no other link fails. Combine it with another model to cut the ring on top of other
+    failures.
+    """
+
+    def sample_masks(self, topology, rates, rng):
+        clusters = get_clusters(topology)
+        rows, cols = topology.get_edges()
+        is_centroid = np.zeros(len(clusters), dtype=bool)
+        is_centroid[np.unique(clusters, return_index=True)[1]] = True
+        ring_links = np.flatnonzero(is_centroid[rows] & is_centroid[cols])
+
+        masks = np.zeros((len(rates), len(rows)), dtype=bool)
+        masks[:, ring_links] = rng.random((len(rates), len(ring_links))) <= rates[:, np.newaxis]
+        return masks
+
+
+class CombinedFailureModel(FailureModel):
+    """
+    A failure model where a link fails if it fails in any of the given models, all at the same failure rate. The
+    failure rate is drawn with the parameters of this model, not with those of the combined models.
+    """
+
+    def __init__(self, models, mean=0.5, sd=0.5, low=0.0, high=1.0, decimals=2) -> None:
+        super().__init__(mean, sd, low, high, decimals)
+        self.models = models
+
+    def sample_masks(self, topology, rates, rng):
+        masks = self.models[0].sample_masks(topology, rates, rng)
+        for model in self.models[1:]:
+            masks |= model.sample_masks(topology, rates, rng)
+        return masks
+
+
+def get_clusters(topology):
+    """
+    Returns the index of the cluster of every node of a topology, which must have clusters like a ClusteredTopology.
+    """
+    if getattr(topology, "num_clusters", None) is None:
+        raise Exception("This failure model needs a topology with clusters")
+    return topology.get_clusters()
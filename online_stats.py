@@ -0,0 +1,323 @@
+import copy
+import math
+from statistics import NormalDist
+import numpy as np
+from aggregation import get_bin_edges, get_bin_indices
+
+class RunningStats():
+    """
+    A class to represent the running count, mean and variance of a stream of values, updated with Welford's method so
+    that no values have to be kept. Values can be added one batch at a time, and two running stats can be merged.
+    """
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0 # Sum of squared differences from the mean
+
+    def add(self, values):
+        """
+        Adds a batch of values to the stats.
+        """
+        values = np.asarray(values, dtype=float)
+        if len(values) == 0:
+            return
+        batch = RunningStats()
+        batch.count = len(values)
+        batch.mean = float(values.mean())
+        batch.m2 = float(((values - batch.mean) ** 2).sum())
+        self.merge(batch)
+
+    def merge(self, other):
+        """
+        Adds the values summarized by another running stats to these stats.
+        """
+        if other.count == 0:
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta ** 2 * self.count * other.count / count
+        self.count = count
+
+    def variance(self):
+        """
+        Returns the sample variance of the values, or nan if there are fewer than two.
+        """
+        if self.count < 2:
+            return float("nan")
+        return self.m2 / (self.count - 1)
+
+    def confidence_interval(self, confidence=0.95):
+        """
+        Returns the half width of the normal approximation confidence interval of the mean, or inf if there are fewer
+        than two values.
+        """
+        if self.count < 2:
+            return float("inf")
+        z = NormalDist().inv_cdf(0.5 + confidence / 2)
+        return z * math.sqrt(self.variance() / self.count)
+
+
+class BinnedRunningStats():
+    """
+    A class to represent running stats of values grouped into num_bins equal width bins of a key between low and high,
+    such as a metric grouped by link failure rate. Keys outside the range go into the first or last bin, and if high is
+    not above low every key goes into the first bin.
+    """
+
+    def __init__(self, num_bins, low=0.0, high=1.0) -> None:
+        self.num_bins = num_bins
+        self.low = low
+        self.high = high
+        self.bins = [RunningStats() for _ in range(num_bins)]
+
+    def get_bin_indices(self, keys):
+        """
+        Returns the index of the bin of every key.
+        """
+        keys = np.asarray(keys, dtype=float)
+        if self.high <= self.low:
+            return np.zeros(len(keys), dtype=np.int64)
+        scaled = (keys - self.low) / (self.high - self.low) * self.num_bins
+        return np.clip(np.floor(scaled).astype(np.int64), 0, self.num_bins - 1)
+
+    def add(self, keys, values):
+        """
+        Adds every value to the bin of its key.
+        """
+        bin_indices = self.get_bin_indices(keys)
+        values = np.asarray(values, dtype=float)
+        for bin_index in np.unique(bin_indices):
+            self.bins[bin_index].add(values[bin_indices == bin_index])
+
+    def counts(self):
+        return np.array([stats.count for stats in self.bins])
+
+    def means(self):
+        return np.array([stats.mean if stats.count else float("nan") for stats in self.bins])
+
+    def confidence_intervals(self, confidence=0.95):
+        """
+        Returns the half width of the confidence interval of the mean of every bin.
+        """
+        return np.array([stats.confidence_interval(confidence) for stats in self.bins])
+
+    def is_converged(self, precision, confidence=0.95, min_samples=30, relative=False):
+        """
+        Returns true once every bin has at least min_samples values and the half width of the confidence interval of
+        its mean is at most precision, or at most precision times the absolute mean if relative is true.
+        """
+        if (self.counts() < min_samples).any():
+            return False
+        half_widths = self.confidence_intervals(confidence)
+        if relative:
+            return bool((half_widths <= precision * np.abs(self.means())).all())
+        return bool((half_widths <= precision).all())
+
+
+class QuantileSketch():
+    """
+    A class to represent an approximate summary of a stream of values that answers quantile queries in constant memory.
+    The values are kept as at most max_centroids centroids, each holding the mean of a run of neighbouring values and
+    how many values it stands for. As long as there are no more distinct values than max_centroids, such as for the
+    small integer results of a simulation, every centroid is a single distinct value and the quantiles are exactly those
+    of np.quantile. Otherwise every centroid holds about the same share of the values, so a quantile is off by at most
+    about 1 / max_centroids in rank.
+    """
+
+    def __init__(self, max_centroids=200) -> None:
+        self.max_centroids = max_centroids
+        self.means = np.empty(0)
+        self.weights = np.empty(0)
+        self.exact = True # Whether every centroid is still a single distinct value
+
+    def add(self, values, weights=None):
+        """
+        Adds a batch of values to the sketch, each standing for weights values if given.
+        """
+        values = np.asarray(values, dtype=float)
+        weights = np.ones(len(values)) if weights is None else np.asarray(weights, dtype=float)
+        means, inverse = np.unique(np.concatenate([self.means, values]), return_inverse=True)
+        weights = np.bincount(inverse, weights=np.concatenate([self.weights, weights]), minlength=len(means))
+        if len(means) > self.max_centroids:
+            # Group the sorted values into max_centroids runs of about the same total weight
+            cumulative = np.cumsum(weights)
+            groups = np.minimum(((cumulative - weights / 2) / cumulative[-1] * self.max_centroids).astype(np.int64),
+                                self.max_centroids - 1)
+            group_weights = np.bincount(groups, weights=weights)
+            nonempty = group_weights > 0
+            means = (np.bincount(groups, weights=means * weights) / np.where(nonempty, group_weights, 1))[nonempty]
+            weights = group_weights[nonempty]
+            self.exact = False
+        self.means = means
+        self.weights = weights
+
+    def merge(self, other):
+        """
+        Adds the values summarized by another sketch to this sketch.
+        """
+        self.add(other.means, other.weights)
+        self.exact = self.exact and other.exact
+
+    def count(self):
+        return float(self.weights.sum())
+
+    def quantile(self, q):
+        """
+        Returns the q quantile of the values, or nan if there are none. q can be a number or an array of numbers.
+        """
+        if len(self.means) == 0:
+            return np.full(np.shape(q), np.nan) if np.ndim(q) else float("nan")
+        cumulative = np.cumsum(self.weights)
+        if self.exact:
+            # Every distinct value takes up the ranks from its first to its last copy, and np.quantile interpolates
+            # linearly between ranks
+            ranks = np.column_stack([cumulative - self.weights, cumulative - 1]).ravel()
+            result = np.interp(np.asarray(q) * (cumulative[-1] - 1), ranks, np.repeat(self.means, 2))
+        else:
+            # Every centroid sits at the middle of the ranks it stands for
+            centers = (cumulative - self.weights / 2) / cumulative[-1]
+            result = np.interp(q, centers, self.means)
+        return result if np.ndim(q) else float(result)
+
+
+# Number of value bins of a histogram that picks its own edges, which must be even so that neighbouring bins can be
+# merged in pairs, and the lowest value it counts on its own, -1 being the weight of a path to a node that can't be
+# reached
+DEFAULT_NUM_VALUE_BINS = 100
+LOWEST_VALUE = -1
+
+class BinnedHistogram():
+    """
+    A class to represent a histogram of values for every one of num_bins equal width bins of a key between low and
+    high, such as a metric for every bin of link failure rate. Values are counted in the bins given by value_edges, and
+    values outside the edges are counted in the first or last bin.
+
+    If no value_edges are given, the histogram picks its own, starting with num_value_bins bins of width 1 around the
+    integers from LOWEST_VALUE. Whenever a value is above the last edge, the width of the bins is doubled, adding up
+    the counts of every pair of neighbouring bins, until the value fits. Every integer value is then counted on its own
+    until the values span more than num_value_bins integers, whatever the range of the metric.
+    """
+
+    def __init__(self, num_bins, value_edges=None, low=0.0, high=1.0, num_value_bins=DEFAULT_NUM_VALUE_BINS) -> None:
+        self.key_edges = get_bin_edges(low, high, num_bins)
+        self.growing = value_edges is None
+        if self.growing:
+            value_edges = LOWEST_VALUE - 0.5 + np.arange(num_value_bins + 1)
+        self.value_edges = np.asarray(value_edges, dtype=float)
+        self.counts = np.zeros((num_bins, len(self.value_edges) - 1), dtype=np.int64)
+
+    def get_width(self):
+        return self.value_edges[1] - self.value_edges[0]
+
+    def coarsen(self):
+        """
+        Doubles the width of the value bins, so that they reach twice as far above the first edge.
+        """
+        num_bins, num_value_bins = self.counts.shape
+        counts = np.zeros_like(self.counts)
+        counts[:, :num_value_bins // 2] = self.counts.reshape(num_bins, num_value_bins // 2, 2).sum(axis=2)
+        self.counts = counts
+        self.value_edges = self.value_edges[0] + 2 * self.get_width() * np.arange(num_value_bins + 1)
+
+    def add(self, keys, values):
+        """
+        Counts every value in the histogram of the bin of its key.
+        """
+        values = np.asarray(values, dtype=float)
+        if self.growing and len(values):
+            top = values.max()
+            while np.isfinite(top) and top >= self.value_edges[-1]:
+                self.coarsen()
+        bins = (get_bin_indices(np.asarray(keys, dtype=float), self.key_edges) * self.counts.shape[1]
+                + get_bin_indices(values, self.value_edges))
+        self.counts += np.bincount(bins, minlength=self.counts.size).reshape(self.counts.shape)
+
+    def merge(self, other):
+        """
+        Adds the counts of another histogram with the same bins of key. If the histograms pick their own value edges,
+        the counts of the one with narrower bins are first added up into the wider bins of the other.
+        """
+        if self.growing:
+            while self.get_width() < other.get_width():
+                self.coarsen()
+            other = copy.copy(other)
+            while other.get_width() < self.get_width():
+                other.coarsen()
+        self.counts += other.counts
+
+
+# Metrics summarized by an OnlineSummary and the quantiles it reports
+SUMMARY_METRICS = ["disconnected_components", "max_flow", "shortest_path"]
+SUMMARY_QUANTILES = [0.05, 0.25, 0.5, 0.75, 0.95]
+
+class OnlineSummary():
+    """
+    A class to represent a running summary of the results of a simulation, kept in constant memory however many
+    simulations are added. For every metric it keeps the running mean and variance, a quantile sketch, and the running
+    stats and a histogram of the metric in each of num_bins bins of link failure rate. The value edges of the
+    histograms are either one array for every metric, a dictionary of the edges of each metric, or None, which lets the
+    histogram of every metric pick edges that fit its values (see BinnedHistogram).
+    """
+
+    def __init__(self, num_bins=10, value_edges=None, max_centroids=200) -> None:
+        self.stats = {metric: RunningStats() for metric in SUMMARY_METRICS}
+        self.sketches = {metric: QuantileSketch(max_centroids) for metric in SUMMARY_METRICS}
+        self.binned_stats = {metric: BinnedRunningStats(num_bins) for metric in SUMMARY_METRICS}
+        if not isinstance(value_edges, dict):
+            value_edges = {metric: value_edges for metric in SUMMARY_METRICS}
+        self.histograms = {metric: BinnedHistogram(num_bins, value_edges.get(metric)) for metric in SUMMARY_METRICS}
+
+    def add(self, columns):
+        """
+        Adds a batch of results, given as a dictionary of arrays like the one returned by result_sink.results_to_columns.
+        """
+        for metric in SUMMARY_METRICS:
+            self.stats[metric].add(columns[metric])
+            self.sketches[metric].add(columns[metric])
+            self.binned_stats[metric].add(columns["link_failure"], columns[metric])
+            self.histograms[metric].add(columns["link_failure"], columns[metric])
+
+    def merge(self, other):
+        """
+        Adds the results summarized by another summary with the same bins to this summary.
+        """
+        for metric in SUMMARY_METRICS:
+            self.stats[metric].merge(other.stats[metric])
+            self.sketches[metric].merge(other.sketches[metric])
+            for stats, other_stats in zip(self.binned_stats[metric].bins, other.binned_stats[metric].bins):
+                stats.merge(other_stats)
+            self.histograms[metric].merge(other.histograms[metric])
+
+    def to_dict(self, confidence=0.95):
+        """
+        Returns the summary as a dictionary that can be stored as JSON.
+        """
+        summary = {}
+        for metric in SUMMARY_METRICS:
+            stats = self.stats[metric]
+            binned_stats = self.binned_stats[metric]
+            summary[metric] = {
+                "count": stats.count,
+                "mean": stats.mean,
+                "variance": stats.variance(),
+                "confidence_interval": stats.confidence_interval(confidence),
+                "quantiles": dict(zip(map(str, SUMMARY_QUANTILES),
+                                      self.sketches[metric].quantile(SUMMARY_QUANTILES).tolist())),
+                "bin_counts": binned_stats.counts().tolist(),
+                "bin_means": binned_stats.means().tolist(),
+                "bin_confidence_intervals": binned_stats.confidence_intervals(confidence).tolist(),
+                "bin_histograms": self.histograms[metric].counts.tolist(),
+                "bin_histogram_edges": self.histograms[metric].value_edges.tolist(),
+            }
+        return summary
+
+    def print_summary(self):
+        """
+        Prints the mean, confidence interval and median of every metric.
+        """
+        for metric in SUMMARY_METRICS:
+            stats = self.stats[metric]
+            print("*** %s: mean %.4f +- %.4f, median %.4f (%d simulations)" % (
+                metric, stats.mean, stats.confidence_interval(), self.sketches[metric].quantile(0.5), stats.count))
@@ -0,0 +1,136 @@
+import contextlib
+import cProfile
+import json
+import math
+import pstats
+import time
+
+# Returned instead of a timed phase when a simulation has no phase timer, so that timing costs nothing when disabled
+NO_PHASE_TIMER = contextlib.nullcontext()
+
+class PhaseTimer():
+    """
+    A class to represent the time spent in each phase of a simulation run, such as sampling link failures or finding
+    the maximum flow. For every phase it keeps the total time, the number of times the phase ran and a histogram of
+    how long each run took, with one bucket per power of two microseconds. It also keeps counters of events.
+
+    If profile_phases is given, a profiler is enabled while those phases run. The profiler can be anything with enable()
+    and disable() methods, by default a cProfile.Profile. The profiler is not sent to worker processes, so only phases
+    run in the main process are profiled.
+    """
+
+    def __init__(self, profile_phases=(), profiler=None) -> None:
+        self.profile_phases = set(profile_phases)
+        self.profiler = profiler
+        if self.profile_phases and profiler is None:
+            self.profiler = cProfile.Profile()
+        self.reset()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["profiler"] = None
+        return state
+
+    def reset(self):
+        """
+        Clears every timing and counter recorded so far.
+        """
+        self.total_seconds = {}
+        self.num_runs = {}
+        self.histograms = {}
+        self.counters = {}
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """
+        Times the code run inside the with block as one run of the named phase.
+        """
+        profile = self.profiler is not None and name in self.profile_phases
+        if profile:
+            self.profiler.enable()
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start_time
+            if profile:
+                self.profiler.disable()
+            self.record(name, elapsed)
+
+    def record(self, name, seconds):
+        """
+        Records one run of the named phase that took the given number of seconds.
+        """
+        self.total_seconds[name] = self.total_seconds.get(name, 0) + seconds
+        self.num_runs[name] = self.num_runs.get(name, 0) + 1
+        bucket = max(0, math.ceil(math.log2(max(seconds * 1e6, 1))))
+        histogram = self.histograms.setdefault(name, {})
+        histogram[bucket] = histogram.get(bucket, 0) + 1
+
+    def count(self, name, amount=1):
+        """
+        Adds amount to the named counter.
+        """
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def pop_records(self):
+        """
+        Returns everything recorded so far in a form that can be sent between processes and merged with merge, and
+        clears it.
+        """
+        records = (self.total_seconds, self.num_runs, self.histograms, self.counters)
+        self.reset()
+        return records
+
+    def merge(self, records):
+        """
+        Adds records returned by pop_records, possibly by a timer in another process, to this timer.
+        """
+        total_seconds, num_runs, histograms, counters = records
+        for name, seconds in total_seconds.items():
+            self.total_seconds[name] = self.total_seconds.get(name, 0) + seconds
+            self.num_runs[name] = self.num_runs.get(name, 0) + num_runs[name]
+        for name, histogram in histograms.items():
+            merged = self.histograms.setdefault(name, {})
+            for bucket, runs in histogram.items():
+                merged[bucket] = merged.get(bucket, 0) + runs
+        for name, amount in counters.items():
+            self.count(name, amount)
+
+    def to_dict(self):
+        """
+        Returns the timings and counters as a dictionary that can be stored as JSON. Histogram buckets are labelled by
+        their upper bound in microseconds.
+        """
+        phases = {}
+        for name in sorted(self.total_seconds, key=self.total_seconds.get, reverse=True):
+            phases[name] = {
+                "total_seconds": self.total_seconds[name],
+                "num_runs": self.num_runs[name],
+                "mean_seconds": self.total_seconds[name] / self.num_runs[name],
+                "histogram_us": {str(2 ** bucket): runs for bucket, runs in sorted(self.histograms[name].items())},
+            }
+        return {"phases": phases, "counters": dict(self.counters)}
+
+    def export_json(self, path):
+        """
+        Writes the timings and counters to a JSON file.
+        """
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=4)
+
+    def print_summary(self):
+        """
+        Prints the total and mean time of every phase and its share of the timed time.
+        """
+        timed_seconds = sum(self.total_seconds.values())
+        for name, phase in self.to_dict()["phases"].items():
+            share = phase["total_seconds"] / timed_seconds * 100 if timed_seconds else 0
+            print("*** %s: %.2fs (%.1f%%), %d runs, %.1fus each" % (name, phase["total_seconds"], share,
+                                                                    phase["num_runs"], phase["mean_seconds"] * 1e6))
+
+    def print_profile(self, sort_by="cumulative", num_lines=30):
+        """
+        Prints the statistics of the default cProfile profiler for the profiled phases.
+        """
+        pstats.Stats(self.profiler).sort_stats(sort_by).print_stats(num_lines)
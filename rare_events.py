@@ -0,0 +1,132 @@
+import numpy as np
+from collections import namedtuple
+from algorithms.find_disconnected_components import find_num_components
+from algorithms.max_flow import max_flow
+from online_stats import RunningStats
+
+# Rare events that can be estimated: the source and sink being disconnected, which is when the shortest path finds no
+# path, and the topology falling apart into at least a threshold number of disconnected components
+DISCONNECTION = "disconnection"
+COMPONENTS = "components"
+
+# Highest failure rate a link is sampled with. A rate of 1 would make the likelihood ratio of a sample where the link
+# survives infinite. The lowest is the failure rate itself.
+MAX_RATE = 0.99
+
+# Number of samples drawn at a time by ImportanceSampler.estimate, so that their failure masks stay small
+SAMPLE_BATCH_SIZE = 256
+
+# The estimate of a rare event probability and the half width of its confidence interval, along with how many samples
+# were drawn, how many of them hit the event, and how many times more samples plain simulations would need for the same
+# precision
+RareEventEstimate = namedtuple("RareEventEstimate", ["probability", "confidence_interval", "num_samples",
+                                                     "num_events", "variance_reduction"])
+
+def get_event_score(event, source=0, sink=1, threshold=None):
+    """
+    Returns a function giving the score of a topology with failed links for the event, along with the score at or
+    below which the event happens. The score of a topology says how close it is to the event, which lets the
+    ImportanceSampler work its way towards an event that it never hits at first.
+
+    For a disconnection the score is the maximum flow from the source to the sink, the number of link disjoint paths
+    left between them, which is 0 exactly when the shortest path finds no path. For components it is minus the number
+    of disconnected components, and the event happens at minus threshold.
+    """
+    if event == DISCONNECTION:
+        return (lambda graph: max_flow(graph, source, sink)), 0
+    if event == COMPONENTS:
+        if threshold is None:
+            raise Exception("The components event needs a threshold number of components")
+        return (lambda graph: -find_num_components(graph)), -threshold
+    raise Exception("Unknown rare event: " + str(event))
+
+
+class ImportanceSampler():
+    """
+    A class to estimate the probability of a rare event when every link of a topology fails independently with
+    failure_rate, such as the source and sink being disconnected at a low failure rate (see get_event_score).
+
+    Instead of sampling the links at failure_rate, where the event almost never happens, every link is sampled at its
+    own rate in self.rates, and every sample is weighted by its likelihood ratio: how much more likely its failures are
+    at failure_rate than at the sampled rates. The weighted mean of the event over the samples is an unbiased estimate
+    of its probability at failure_rate.
+
+    The sampled rates are fitted with the multilevel cross-entropy method (see fit), which raises the rates of the links
+    whose failures make up the event, such as the links around the source and the sink, and leaves the other links
+    close to failure_rate. This cuts the number of samples needed for a given precision by orders of magnitude when the
+    event is rare.
+    """
+
+    def __init__(self, graph, failure_rate, score, target) -> None:
+        if not 0 < failure_rate < MAX_RATE:
+            raise Exception("The failure rate must be greater than 0 and less than " + str(MAX_RATE))
+        self.graph = graph
+        self.failure_rate = failure_rate
+        self.score = score
+        self.target = target
+        self.rates = np.full(graph.num_edges(), float(failure_rate))
+
+    def sample(self, rng, k):
+        """
+        Returns the failure masks of k samples at the sampled rates, the log likelihood ratio of every sample, and the
+        score of every sample.
+        """
+        masks = rng.random((k, len(self.rates))) <= self.rates
+        log_ratios = (masks @ (np.log(self.failure_rate) - np.log(self.rates))
+                      + ~masks @ (np.log1p(-self.failure_rate) - np.log1p(-self.rates)))
+        scores = np.array([self.score(self.graph.with_failures(mask)) for mask in masks])
+        return masks, log_ratios, scores
+
+    def fit(self, rng, num_samples=1000, rho=0.1, smoothing=0.7, num_refinements=3, max_iterations=20):
+        """
+        Fits the sampled rates to the event with the multilevel cross-entropy method. Every iteration draws num_samples
+        samples, takes the score that the best rho of them reach as the next level, and moves the rates towards the
+        likelihood ratio weighted failure rate of every link over the samples that reach the level, by the smoothing
+        fraction. Once the level reaches the event, num_refinements more iterations fit the rates to the samples that
+        hit the event, which brings the links that play no part in it back towards failure_rate. Returns true if the
+        event was reached within max_iterations.
+        """
+        last_level = np.inf
+        refinements = 0
+        for _ in range(max_iterations):
+            masks, log_ratios, scores = self.sample(rng, num_samples)
+            level = max(np.quantile(scores, rho, method="lower"), self.target)
+            if self.target < last_level <= level:
+                if not (scores < last_level).any():
+                    # The samples are stuck at the last level, so every link is made more likely to fail to get past it
+                    self.rates = np.clip(2 * self.rates, self.failure_rate, MAX_RATE)
+                    continue
+                # Scores are integers, so the level moves down at least one step at a time
+                level = max(scores[scores < last_level].max(), self.target)
+
+            elite = scores <= level
+            if elite.any():
+                # Only the ratios between the weights matter, so they are scaled to avoid underflow
+                weights = np.exp(log_ratios[elite] - log_ratios[elite].max())
+                fitted = weights @ masks[elite] / weights.sum()
+                self.rates = np.clip(smoothing * fitted + (1 - smoothing) * self.rates, self.failure_rate, MAX_RATE)
+            last_level = level
+            if level <= self.target:
+                refinements += 1
+                if refinements > num_refinements:
+                    break
+        return last_level <= self.target
+
+    def estimate(self, rng, num_samples, confidence=0.95):
+        """
+        Returns the RareEventEstimate of the probability of the event from num_samples samples at the sampled rates.
+        """
+        stats = RunningStats()
+        num_events = 0
+        for start in range(0, num_samples, SAMPLE_BATCH_SIZE):
+            _, log_ratios, scores = self.sample(rng, min(SAMPLE_BATCH_SIZE, num_samples - start))
+            hits = scores <= self.target
+            stats.add(np.where(hits, np.exp(log_ratios), 0.0))
+            num_events += int(hits.sum())
+
+        # A plain Monte Carlo sample of the event has a variance of p * (1 - p)
+        variance = stats.variance()
+        plain_variance = stats.mean * (1 - stats.mean)
+        variance_reduction = plain_variance / variance if variance > 0 else float("nan")
+        return RareEventEstimate(stats.mean, stats.confidence_interval(confidence), num_samples, num_events,
+                                 variance_reduction)
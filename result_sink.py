@@ -0,0 +1,226 @@
+import json
+import os
+import numpy as np
+from abc import ABC, abstractmethod
+from checkpoint import CHECKPOINT_FILE
+
+# Columns stored by a result sink and the type of each column
+RESULT_COLUMNS = {
+    "link_failure": np.float64,
+    "disconnected_components": np.int64,
+    "max_flow": np.int64,
+    "shortest_path": np.int64,
+    "num_nodes": np.int32,
+}
+
+# Columns with a row of values for every simulation, which are only stored when a simulation records the shortest paths
+# to several destinations or the Gomory-Hu trees of its topologies (see Simulation.simulate), and the type of each column
+MATRIX_COLUMNS = {
+    "path_destinations": np.int32,
+    "path_distances": np.int32,
+    "gomory_hu_parent": np.int32,
+    "gomory_hu_weight": np.int32,
+}
+
+METADATA_FILE = "metadata.json"
+
+def results_to_columns(results):
+    """
+    Converts the results of a batch returned by Simulation.run_batch into a dictionary with a NumPy array for every
+    column in RESULT_COLUMNS. On a randomized topology the results are (value, number of nodes) tuples, of which only
+    the value is kept since the number of nodes has its own column.
+    """
+    columns = {}
+    for column, dtype in RESULT_COLUMNS.items():
+        values = results[column]
+        if values and isinstance(values[0], tuple):
+            values = [value[0] for value in values]
+        columns[column] = np.asarray(values, dtype=dtype)
+    return columns
+
+def get_matrix_widths(results):
+    """
+    Returns the number of values per row of every MATRIX_COLUMNS column in the results of a batch returned by
+    Simulation.run_batch, leaving out the columns the batch doesn't record.
+    """
+    return {column: len(results[column][0]) for column in MATRIX_COLUMNS if len(results.get(column, []))}
+
+def check_matrix_widths(stored_widths, widths):
+    """
+    Raises an exception unless a batch records the same matrix columns, with the same number of values per row, as
+    the results it is stored with, so that every column keeps one row per simulation.
+    """
+    if stored_widths != widths:
+        def describe(widths):
+            described = [column + " (" + str(width) + " per simulation)" for column, width in widths.items()]
+            return ", ".join(described) or "none"
+        raise Exception("Results stored together must record the same paths and Gomory-Hu trees in every simulation, "
+                        "the stored results record " + describe(stored_widths) + " but the new ones record "
+                        + describe(widths))
+
+
+class ResultSink(ABC):
+    """
+    A class to represent where the results of a simulation are stored.
+    """
+
+    @abstractmethod
+    def write(self, results):
+        """
+        Stores the results of a batch returned by Simulation.run_batch.
+        """
+        pass
+
+    @abstractmethod
+    def flush(self):
+        """
+        Makes sure every result written so far is stored.
+        """
+        pass
+
+    @abstractmethod
+    def read(self):
+        """
+        Returns the stored results as a dictionary with an array for every column in RESULT_COLUMNS.
+        """
+        pass
+
+    def close(self):
+        """
+        Flushes the sink once no more results will be written.
+        """
+        self.flush()
+
+
+class ColumnarResultSink(ResultSink):
+    """
+    A result sink that streams results to a directory on disk, with one raw binary file per column. Results are
+    buffered and appended to the files in chunks of chunk_size rows, so memory use doesn't grow with the number of
+    simulations. metadata.json records the number of rows that have been flushed, and read() returns the columns as
+    read-only memory mapped arrays. The MATRIX_COLUMNS a simulation records are stored the same way, row after row, and
+    read back as 2D arrays. Every result written to a sink must record the same matrix columns as the first, so that
+    every column has a row for every simulation.
+
+    If append is false, any results already in the directory are removed, along with the checkpoint of the run that
+    wrote them.
+    """
+
+    def __init__(self, directory, chunk_size=65536, append=False) -> None:
+        self.directory = directory
+        self.chunk_size = chunk_size
+        self.buffers = {column: [] for column in RESULT_COLUMNS}
+        self.num_buffered = 0
+        self.num_rows = 0
+        # Number of values per row of every matrix column that has been written
+        self.matrix_widths = {}
+
+        os.makedirs(directory, exist_ok=True)
+        if append and os.path.exists(os.path.join(directory, METADATA_FILE)):
+            metadata = read_metadata(directory)
+            self.num_rows = metadata["num_rows"]
+            self.matrix_widths = {column: width for column, (_, width) in metadata.get("matrix_columns", {}).items()}
+        else:
+            for column in RESULT_COLUMNS:
+                open(self.column_path(column), "wb").close()
+            for column in MATRIX_COLUMNS:
+                if os.path.exists(self.column_path(column)):
+                    os.remove(self.column_path(column))
+            # A checkpoint left behind would describe rows that are gone, and resuming from it would pad the columns
+            if os.path.exists(os.path.join(directory, CHECKPOINT_FILE)):
+                os.remove(os.path.join(directory, CHECKPOINT_FILE))
+            self.write_metadata()
+
+    def column_path(self, column):
+        return os.path.join(self.directory, column + ".bin")
+
+    def write_metadata(self):
+        """
+        Replaces metadata.json in one step, so it never describes rows that are only partially written.
+        """
+        metadata = {
+            "num_rows": self.num_rows,
+            "columns": {column: np.dtype(dtype).str for column, dtype in RESULT_COLUMNS.items()},
+            "matrix_columns": {column: [np.dtype(MATRIX_COLUMNS[column]).str, width]
+                               for column, width in self.matrix_widths.items()},
+        }
+        temp_path = os.path.join(self.directory, METADATA_FILE + ".tmp")
+        with open(temp_path, "w") as f:
+            json.dump(metadata, f)
+        os.replace(temp_path, os.path.join(self.directory, METADATA_FILE))
+
+    def write(self, results):
+        widths = get_matrix_widths(results)
+        if self.num_rows + self.num_buffered == 0:
+            # The first results decide which matrix columns are stored
+            for column in widths:
+                open(self.column_path(column), "wb").close()
+            self.matrix_widths = widths
+        else:
+            check_matrix_widths(self.matrix_widths, widths)
+        columns = results_to_columns(results)
+        for column, values in columns.items():
+            self.buffers[column].append(values)
+        for column in widths:
+            self.buffers.setdefault(column, []).append(np.asarray(results[column], dtype=MATRIX_COLUMNS[column]))
+        self.num_buffered += len(columns["link_failure"])
+        if self.num_buffered >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if self.num_buffered == 0:
+            return
+        for column, dtype in RESULT_COLUMNS.items():
+            with open(self.column_path(column), "ab") as f:
+                np.concatenate(self.buffers[column]).astype(dtype).tofile(f)
+            self.buffers[column] = []
+        for column in self.matrix_widths:
+            rows = self.buffers.pop(column, [])
+            if rows:
+                with open(self.column_path(column), "ab") as f:
+                    np.concatenate(rows).tofile(f)
+        self.num_rows += self.num_buffered
+        self.num_buffered = 0
+        self.write_metadata()
+
+    def read(self):
+        self.flush()
+        return load_results(self.directory)
+
+    def truncate(self, num_rows):
+        """
+        Discards every result after the first num_rows, including any that are still buffered.
+        """
+        self.buffers = {column: [] for column in RESULT_COLUMNS}
+        self.num_buffered = 0
+        for column, dtype in RESULT_COLUMNS.items():
+            os.truncate(self.column_path(column), num_rows * np.dtype(dtype).itemsize)
+        for column, width in self.matrix_widths.items():
+            os.truncate(self.column_path(column), num_rows * width * np.dtype(MATRIX_COLUMNS[column]).itemsize)
+        self.num_rows = num_rows
+        self.write_metadata()
+
+
+def read_metadata(directory):
+    with open(os.path.join(directory, METADATA_FILE)) as f:
+        return json.load(f)
+
+def load_results(directory):
+    """
+    Returns the results stored in a directory by a ColumnarResultSink as a dictionary of read-only memory mapped
+    arrays, one per column. Matrix columns are 2D arrays with a row per simulation.
+    """
+    metadata = read_metadata(directory)
+    num_rows = metadata["num_rows"]
+    results = {}
+    for column, dtype in metadata["columns"].items():
+        if num_rows == 0:
+            results[column] = np.empty(0, dtype=dtype)
+        else:
+            results[column] = np.memmap(os.path.join(directory, column + ".bin"), dtype=dtype, mode="r", shape=(num_rows,))
+    for column, (dtype, width) in metadata.get("matrix_columns", {}).items():
+        if num_rows == 0 or width == 0:
+            results[column] = np.empty((num_rows, width), dtype=dtype)
+        else:
+            results[column] = np.memmap(os.path.join(directory, column + ".bin"), dtype=dtype, mode="r",
+                                        shape=(num_rows, width))
+    return results
@@ -0,0 +1,154 @@
+"""
+A command line entry point to run a simulation without writing a script.
+
+Run from the root of the repository, for example:
+    python run_simulation.py constant --num-sims 10000 --num-nodes 100 --links-per-node 10 --workers 4 --output out
+
+The results are streamed to the --output directory with a ColumnarResultSink and can be read back with
+result_sink.load_results. Nothing is plotted unless --visualize is given, so plotly is never imported on a headless run.
+"""
+import argparse
+import numpy as np
+from simulation import (FullyConnectedTopologySimulation, ConstantTopologySimulation, ClusteredTopologySimulation)
+from result_sink import ColumnarResultSink
+from profiling import PhaseTimer
+from failure_models import LinkFailureModel, NodeFailureModel, ClusterOutageModel, RingCutModel
+from rare_events import DISCONNECTION, COMPONENTS
+
+TOPOLOGIES = ["fully_connected", "constant", "clustered"]
+
+FAILURE_MODELS = {
+    "link": LinkFailureModel,
+    "node": NodeFailureModel,
+    "cluster_outage": ClusterOutageModel,
+    "ring_cut": RingCutModel,
+}
+
+def create_simulation(args):
+    """
+    Creates the simulation described by the command line arguments.
+    """
+    if args.topology == "fully_connected":
+        return FullyConnectedTopologySimulation(args.num_sims, args.num_nodes, seed=args.seed)
+    if args.topology == "constant":
+        return ConstantTopologySimulation(args.num_sims, args.num_nodes, args.links_per_node, seed=args.seed)
+    return ClusteredTopologySimulation(args.num_sims, args.num_nodes, args.num_clusters, seed=args.seed)
+
+def parse_destinations(value):
+    """
+    Returns the --destinations argument, which is either "all" or a positive number.
+    """
+    if value == "all":
+        return value
+    try:
+        destinations = int(value)
+    except ValueError:
+        destinations = 0
+    if destinations < 1:
+        raise argparse.ArgumentTypeError("must be \"all\" or a positive number, not " + repr(value))
+    return destinations
+
+def print_summary(results):
+    """
+    Prints the number of simulations and the mean of every result.
+    """
+    print("*** Simulations: " + str(len(results["link_failure"])))
+    for column in ["link_failure", "disconnected_components", "max_flow", "shortest_path"]:
+        if len(results[column]):
+            print("*** Mean %s: %.4f" % (column, np.mean(results[column])))
+
+def main():
+    parser = argparse.ArgumentParser(description="Run Monte Carlo simulations of link failures on a network topology.")
+    parser.add_argument("topology", choices=TOPOLOGIES)
+    parser.add_argument("--num-sims", type=int, default=1000, help="number of simulations, or the most that are run "
+                                                                    "with --target-precision")
+    parser.add_argument("--num-nodes", type=int, default=-1, help="number of nodes, or -1 to randomize the topology")
+    parser.add_argument("--links-per-node", type=int, default=10, help="links per node of a constant topology")
+    parser.add_argument("--num-clusters", type=int, default=10, help="number of clusters of a clustered topology")
+    parser.add_argument("--seed", type=int, help="seed of the simulation, so that a run can be reproduced")
+    parser.add_argument("--workers", type=int, default=1, help="number of worker processes")
+    parser.add_argument("--failure-model", choices=FAILURE_MODELS, default="link", help="how links fail, the "
+                        "cluster_outage and ring_cut models need a clustered topology")
+    parser.add_argument("--percolation", action="store_true", help="sample link failures with a percolation sweep")
+    parser.add_argument("--destinations", type=parse_destinations, help="record the shortest paths from the source "
+                        "to \"all\" nodes or to this many random destinations in every simulation")
+    parser.add_argument("--all-pairs-max-flow", action="store_true", help="record the Gomory-Hu tree of every "
+                        "simulation, which gives the maximum flow between every pair of nodes")
+    parser.add_argument("--warm-start-max-flow", action="store_true", help="start the maximum flow of every "
+                        "simulation from the maximum flow of the intact topology")
+    parser.add_argument("--cached-shortest-path", action="store_true", help="reuse the shortest path tree of the "
+                        "intact topology in every simulation")
+    parser.add_argument("--output", help="directory to stream the results to, instead of keeping them in memory")
+    parser.add_argument("--checkpoint-interval", type=float, help="seconds between checkpoints of the --output run")
+    parser.add_argument("--resume", action="store_true", help="continue the run checkpointed in --output")
+    parser.add_argument("--target-precision", type=float, help="stop once the results converge to this precision")
+    parser.add_argument("--max-seconds", type=float, help="time budget of a --target-precision run")
+    parser.add_argument("--rare-event", choices=[DISCONNECTION, COMPONENTS], help="estimate the probability of the "
+                        "source and sink being disconnected, or of at least --component-threshold components, at "
+                        "--failure-rate with importance sampling instead of running the simulations")
+    parser.add_argument("--failure-rate", type=float, default=0.05, help="link failure rate of a --rare-event run")
+    parser.add_argument("--component-threshold", type=int, help="number of components of the components --rare-event")
+    parser.add_argument("--profile", help="file to export the time spent in each phase of the run to, as JSON")
+    parser.add_argument("--visualize", action="store_true", help="generate the html graphs in the results folder")
+    args = parser.parse_args()
+
+    if (args.resume or args.checkpoint_interval is not None) and args.output is None:
+        parser.error("--resume and --checkpoint-interval need --output")
+    if args.target_precision is not None and args.percolation:
+        parser.error("--target-precision can't be used with --percolation")
+    if args.target_precision is not None and args.checkpoint_interval is not None:
+        parser.error("--target-precision can't be used with --checkpoint-interval")
+    if args.rare_event == COMPONENTS and args.component_threshold is None:
+        parser.error("the components --rare-event needs --component-threshold")
+
+    simulation = create_simulation(args)
+    if simulation.randomize_num_nodes:
+        # These need the same topology in every simulation, which a randomized topology doesn't have
+        if args.rare_event is not None:
+            parser.error("--rare-event needs a fixed topology, set --num-nodes and the other topology parameters")
+        if args.destinations == "all" or args.all_pairs_max_flow:
+            parser.error("--destinations all and --all-pairs-max-flow need a fixed topology, set --num-nodes and the "
+                         "other topology parameters")
+
+    if args.rare_event is not None:
+        estimate = simulation.estimate_rare_event(args.failure_rate, args.rare_event, args.component_threshold,
+                                                  num_samples=args.num_sims)
+        print("*** Probability of %s: %.4g +- %.4g (%d samples, %.4g times fewer than plain simulations)" % (
+            args.rare_event, estimate.probability, estimate.confidence_interval, estimate.num_samples,
+            estimate.variance_reduction))
+        return
+
+    # Set on the simulation directly so that resume uses it as well
+    simulation.failure_model = FAILURE_MODELS[args.failure_model]()
+    result_sink = None
+    if args.output is not None:
+        result_sink = ColumnarResultSink(args.output, append=args.resume)
+    phase_timer = None
+    if args.profile is not None:
+        phase_timer = PhaseTimer()
+        # resume has no phase_timer argument, so the timer is attached to the simulation directly
+        simulation.phase_timer = phase_timer
+
+    if args.resume:
+        simulation.resume(result_sink, workers=args.workers, checkpoint_interval=args.checkpoint_interval)
+    elif args.target_precision is not None:
+        simulation.simulate_adaptive(args.target_precision, max_seconds=args.max_seconds, workers=args.workers,
+                                     result_sink=result_sink, destinations=args.destinations,
+                                     all_pairs_max_flow=args.all_pairs_max_flow,
+                                     warm_start_max_flow=args.warm_start_max_flow,
+                                     cached_shortest_path=args.cached_shortest_path)
+    else:
+        simulation.simulate(workers=args.workers, percolation=args.percolation, result_sink=result_sink,
+                            checkpoint_interval=args.checkpoint_interval, destinations=args.destinations,
+                            all_pairs_max_flow=args.all_pairs_max_flow,
+                            warm_start_max_flow=args.warm_start_max_flow,
+                            cached_shortest_path=args.cached_shortest_path)
+
+    print_summary(simulation.get_results())
+    if phase_timer is not None:
+        phase_timer.export_json(args.profile)
+    if args.visualize:
+        simulation.visualize_simulation()
+
+if __name__ == "__main__":
+    main()
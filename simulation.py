@@ -1,16 +1,25 @@
 import copy
 import time
-from algorithms.shortest_path import shortest_path
-from algorithms.find_disconnected_components import find_num_components
-from algorithms.max_flow import max_flow
+from algorithms.shortest_path import shortest_path, shortest_path_tree, CachedShortestPathTree
+from algorithms.find_disconnected_components import find_num_components, find_num_components_sweep
+from algorithms.max_flow import max_flow, WarmStartMaxFlow
+from algorithms.gomory_hu import gomory_hu_tree, tree_max_flow
 from topologies.topology import (FullyConnectedTopology, ConstantTopology, ClusteredTopology)
-import random
-from scipy.stats import truncnorm
-import plotly.express as px
-import plotly.graph_objects as go
+from topologies.shared_store import SharedTopologyStore, attach
+from result_sink import (ColumnarResultSink, results_to_columns, get_matrix_widths, check_matrix_widths,
+                         RESULT_COLUMNS, MATRIX_COLUMNS)
+from checkpoint import read_checkpoint, write_checkpoint
+from profiling import NO_PHASE_TIMER
+from online_stats import BinnedRunningStats
+from failure_models import LinkFailureModel
+from rare_events import ImportanceSampler, get_event_score, DISCONNECTION
+from aggregation import (get_bin_edges, get_integer_bin_edges, get_bin_centers, histogram_2d, binned_means_2d,
+                         binned_quantiles)
+import numpy as np
 import os
 from abc import ABC, abstractmethod
-from progress.bar import Bar
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
 
 # Directory paths to the results generated from visualizing a simulation
 RESULTS_DIR = {
@@ -19,249 +28,899 @@ RESULTS_DIR = {
     "shortest_path": "results/shortest_path"
 }
 
+# Number of bins the results are aggregated into by the visualize methods, along the link failure rate, the number of
+# nodes and the value of a metric, and the quantiles plotted for every bin
+NUM_LINK_FAILURE_BINS = 100
+NUM_NODE_BINS = 50
+NUM_VALUE_BINS = 100
+PLOT_QUANTILES = [0.05, 0.25, 0.5, 0.75, 0.95]
+
 # Constants to determine the range of the values picked when generating a random topology
 MIN_NODES = 25
 MAX_NODES = 150
 MIN_CLUSTERS = 5
 MAX_CLUSTERS = 15
 
+# Number of simulations that are run together in one batch. Every batch draws from its own random number stream, so the
+# results for a given seed do not depend on how the batches are spread across workers.
+SAMPLE_BATCH_SIZE = 256
+
+# Metrics whose convergence is tracked by Simulation.simulate_adaptive, and the number of link failure rate bins used
+METRICS = ["disconnected_components", "max_flow", "shortest_path"]
+DEFAULT_NUM_BINS = 10
+
+# Number of batches submitted ahead to each worker process
+BATCHES_IN_FLIGHT_PER_WORKER = 2
+
+# A record of the results of one simulation, yielded by Simulation.iter_simulate
+TrialRecord = namedtuple("TrialRecord", list(RESULT_COLUMNS))
+
+# Keys of the random number streams spawned from a simulation's seed
+TOPOLOGY_STREAM = 0
+SOURCE_SINK_STREAM = 1
+BATCH_STREAM = 2
+RARE_EVENT_STREAM = 3
+
 class Simulation(ABC):
     """
     A class to represent a simulation of a network topology
+
+    A child class passes its fixed topology to the constructor, or None to have it built by generate_topology, which
+    then has to build the fixed topology as well as the random ones. Building it in generate_topology lets the
+    simulation seed it, cache it (see get_fixed_topology) and rebuild it when resuming a run with another seed.
     """
     
-    def __init__(self, num_sims, topology, graph_name, randomize_num_nodes) -> None:
+    def __init__(self, num_sims, topology, graph_name, randomize_num_nodes, seed=None, topology_cache=None) -> None:
         self.num_sims = num_sims
         self.randomize_num_nodes = randomize_num_nodes
         self.graph_name = graph_name
         self.link_failure_samples = []
         self.shortest_path_result = []
+        # Shortest path weights from the source to several destinations, one row per simulation, if they are recorded
+        self.path_destinations = []
+        self.path_distances = []
+        self.destinations = None
+        # Gomory-Hu trees of every simulation, one row per simulation, if they are recorded
+        self.gomory_hu_parents = []
+        self.gomory_hu_weights = []
+        self.all_pairs_max_flow = False
+        self.warm_start_max_flow = False
+        # The maximum flow of the intact fixed topology, built on first use in each process
+        self.warm_start = None
+        self.cached_shortest_path = False
+        # The shortest path tree of the intact fixed topology, built on first use in each process
+        self.cached_tree = None
         self.max_flow_result = []
         self.disconnected_components_result = []
+        self.percolation = False
+        # Whether run_batch returns the graph of every randomized topology, which is only needed when the results are
+        # kept in the result lists
+        self.keep_graphs = True
+        self.result_sink = None
+        self.topology_cache = topology_cache
+        self.phase_timer = None
+        self.binned_stats = None
+        self.failure_model = LinkFailureModel()
+        # Every run of simulate, simulate_adaptive or iter_simulate gets its own index, which keys the random number
+        # streams of its batches so that running the same simulation again draws new samples
+        self.run_index = 0
+        self.num_runs = 0
+        self.seed_sequence = np.random.SeedSequence(seed)
+        self.rng = np.random.default_rng(self.spawn_seed(TOPOLOGY_STREAM))
         
-        if randomize_num_nodes:
-            self.topology = self.generate_topology()
-        else:
-            self.topology = topology
+        # Whether the fixed topology was passed in rather than built by generate_topology
+        self.topology_given = topology is not None and not randomize_num_nodes
+        self.topology = topology if self.topology_given else self.generate_topology()
         
         # keep a list of the original graphs before sampling the link failure in case it is needed for analysis
-        # if randomize_num_nodes is false, this list will only contain one graph
-        self.original_graphs = [copy.deepcopy(self.topology.graph)] # use deep copy to avoid copying by reference
+        # if randomize_num_nodes is false, this list will only contain one graph, otherwise it contains the graph of
+        # every simulation. The graphs are the topologies' CompactGraphs, which are never changed by a simulation, so
+        # they are kept without copying them. Call to_matrix on one to get its adjacency matrix.
+        self.original_graphs = []
+        if not randomize_num_nodes:
+            self.original_graphs.append(self.topology.get_compact_graph())
 
     @abstractmethod
     def generate_topology(self):
         """
-        Creates a random topology.
+        Creates the topology to simulate on using self.rng. If self.randomize_num_nodes is true, the topology is random.
+        Otherwise it is the fixed topology of the simulation, which is only built here if none was passed to the
+        constructor.
         """
         pass
+
+    def get_fixed_topology(self, topology_class, *params):
+        """
+        Builds the topology_class topology with the given parameters using self.rng. If the simulation has a topology
+        cache (see topologies/cache.py), the topology is looked up by the seed of its random number stream instead, so a
+        cached topology is the same one the simulation would have built itself.
+        """
+        if self.topology_cache is None:
+            return topology_class(*params, self.rng)
+        return self.topology_cache.get(topology_class, params, self.spawn_seed(TOPOLOGY_STREAM))
+
+    def phase(self, name):
+        """
+        Returns a context manager that times the code inside it as the named phase if the simulation has a phase timer
+        (see profiling.py), and does nothing otherwise.
+        """
+        if self.phase_timer is None:
+            return NO_PHASE_TIMER
+        return self.phase_timer.phase(name)
+
+    def spawn_seed(self, *key):
+        """
+        Returns the seed of the random number stream with the given key. The streams are independent of each other and
+        only depend on the simulation's seed.
+        """
+        return np.random.SeedSequence(self.seed_sequence.entropy, spawn_key=self.seed_sequence.spawn_key + key)
+
+    def start_run(self):
+        """
+        Gives the run that is starting the next run index. The first run of a simulation has index 0, so its results
+        only depend on the seed.
+        """
+        self.run_index = self.num_runs
+        self.num_runs += 1
     
-    def sample_truncated_normal(self, mean, sd, low, upp):
+    def sample_link_failure_rates(self, k):
         """
-        Returns a sample from a truncated normal distribution.
+        Samples the link failure rate of k trials at once from the failure model. By default the rates follow a normal
+        distribution with a mean of 0.5 and a standard deviation of 0.5, truncated to [0, 1] and rounded to 2 decimals.
         """
-        return truncnorm((low - mean) / sd, (upp - mean) / sd, loc=mean, scale=sd)
+        return self.failure_model.sample_rates(self.rng, k)
+
+    def sample_link_failure_batch(self, k):
+        """
+        Samples the link failure rate of k trials at once, along with a failure mask for each trial from the failure
+        model. Row r of the returned masks has one entry per link in self.topology.get_edges() and is True if that link
+        fails in trial r.
+        """
+        return self.failure_model.sample_batch(self.topology, k, self.rng)
+
+    def sample_percolation_batch(self, k):
+        """
+        Samples k trials like sample_link_failure_batch with independent link failures, but from one random order of the
+        links: trial r keeps the first links of the order, as many as survive its failure rate. The number of disconnected components of every trial
+        is then read from a single union-find sweep over the order and returned as a third value.
+
+        Every trial on its own has the same distribution as with sample_link_failure_batch, but the trials of a batch
+        are nested in each other since they share the order.
+        """
+        link_failures = self.sample_link_failure_rates(k)
+        graph = self.topology.get_compact_graph()
+        num_edges = graph.num_edges()
+
+        order = self.rng.permutation(num_edges)
+        num_components_after = find_num_components_sweep(graph, order)
+        surviving_links = self.rng.binomial(num_edges, 1 - link_failures)
+
+        position = np.empty(num_edges, dtype=np.int64)
+        position[order] = np.arange(num_edges)
+        masks = position[np.newaxis, :] >= surviving_links[:, np.newaxis]
+        return link_failures, masks, [num_components_after[i] for i in surviving_links]
 
     def sample_link_failure(self):
         """
         For every link in a topology, this method samples from a number between 0 and 1 from a normal distribution 
         and generates a random number between 0 and 1. If the random number is less than the sampled number, the
-        link will be removed from the topology.
-        """
-        # Sampling a truncated normal distribution from a range of [0, 1] by specifying the mean to be 0.5, the standard
-        # deviation to be 0.5 (so the range of samples is between 0.5-0.5 to 0.5+0.5 => 0 to 1), and bounding the results
-        # to be between 0 to 1 inclusive.
-        x = self.sample_truncated_normal(0.5, 0.5, 0, 1)
-        link_failure = round(x.rvs(), 2)
-        self.link_failure_samples.append(link_failure)
-        
-        for i in range(len(self.topology.graph)):
-            for j in range(i):
-                if (self.topology.graph[i][j] > 0):
-                    if random.random() <= link_failure:
-                        self.topology.destroy_link(i, j)
+        link fails. Returns the sampled link failure rate and a view of the topology without the failed links, the
+        topology itself is left unchanged.
+        """
+        link_failures, masks = self.sample_link_failure_batch(1)
+        return float(link_failures[0]), self.topology.get_compact_graph().with_failures(masks[0])
             
-    def simulate_disconnected_components(self):
+    def simulate_disconnected_components(self, graph):
         """
-        Finds the number of disconnected components on the current topology and stores it.
+        Finds the number of disconnected components on the current topology and returns the result to store.
         """
-        sampled_disc_components = find_num_components(self.topology.graph)
+        sampled_disc_components = find_num_components(graph)
         if self.randomize_num_nodes:
-            self.disconnected_components_result.append((sampled_disc_components, len(self.topology.graph)))
-        else:
-            self.disconnected_components_result.append(sampled_disc_components)
+            return (sampled_disc_components, len(self.topology))
+        return sampled_disc_components
         
-    def simulate_max_flow(self, source, sink):
+    def simulate_max_flow(self, graph, source, sink):
         """
-        Finds the maximum flow of the current topology given a source and sink and stores it.
+        Finds the maximum flow of the current topology given a source and sink and returns the result to store.
         """
-        sampled_max_flow = max_flow(self.topology.graph, source, sink)
+        sampled_max_flow = max_flow(graph, source, sink)
         if self.randomize_num_nodes:
-            self.max_flow_result.append((sampled_max_flow, len(self.topology.graph)))
-        else:
-            self.max_flow_result.append(sampled_max_flow)
+            return (sampled_max_flow, len(self.topology))
+        return sampled_max_flow
     
-    def simulate_shortest_path(self, source, dest):
+    def simulate_gomory_hu_tree(self, graph, source, sink):
+        """
+        Finds the Gomory-Hu tree of the current topology, which gives the maximum flow between every pair of nodes.
+        Returns the result to store for the source and sink, like simulate_max_flow, along with the parent and weight
+        lists of the tree (see algorithms/gomory_hu.py).
+        """
+        parent, weight = gomory_hu_tree(graph)
+        return tree_max_flow(parent, weight, source, sink), parent, weight
+
+    def get_warm_start(self, source, sink):
+        """
+        Returns the WarmStartMaxFlow of the fixed topology for the source and sink, building it on first use.
+        """
+        if self.warm_start is None or (self.warm_start.source, self.warm_start.sink) != (source, sink):
+            self.warm_start = WarmStartMaxFlow(self.topology.get_compact_graph(), source, sink)
+        return self.warm_start
+
+    def get_cached_tree(self, source):
+        """
+        Returns the CachedShortestPathTree of the fixed topology for the source, building it on first use.
+        """
+        if self.cached_tree is None or self.cached_tree.source != source:
+            self.cached_tree = CachedShortestPathTree(self.topology.get_compact_graph(), source)
+        return self.cached_tree
+
+    def simulate_shortest_path(self, graph, source, dest):
         """
-        Finds the shortest path of the current topology given a source and sink and stores it.
+        Finds the shortest path of the current topology given a source and sink and returns the result to store.
         """
-        path, weight = shortest_path(self.topology.graph, source, dest)
-        path_length = len(path) - 1
-        if path == []:
-            path_length = 0
+        path, weight = shortest_path(graph, source, dest)
         if (self.randomize_num_nodes):
-            self.shortest_path_result.append((weight, len(self.topology.graph)))
-        else:
-            self.shortest_path_result.append(weight)
+            return (weight, len(self.topology))
+        return weight
     
+    def simulate_shortest_path_tree(self, graph, source, sink):
+        """
+        Finds the shortest paths from the source to every node of the current topology with a single shortest path
+        tree. Returns the result to store for the sink, like simulate_shortest_path, along with the destinations and
+        weights of the paths to record (see simulate). The weight of a path to a node that can't be reached is -1.
+        """
+        distance, _ = shortest_path_tree(graph, source)
+        distance = np.array(distance)
+        distance[np.isinf(distance)] = -1
+        distance = distance.astype(np.int32)
+
+        weight = max(int(distance[sink]), 0)
+        if self.randomize_num_nodes:
+            weight = (weight, len(self.topology))
+        if self.destinations == "all":
+            return weight, None, distance
+        # Destinations are drawn with replacement from every node except the source
+        destinations = self.rng.integers(0, len(distance) - 1, size=self.destinations, dtype=np.int32)
+        destinations[destinations >= source] += 1
+        return weight, destinations, distance[destinations]
+
     def get_random_source_sink(self):
         """
         Picks a random source and sink on the current topology.
         """
         s = 0
-        t = s
-        while t == s:
-            t = random.randint(0, len(self.topology.graph)-1)
+        t = int(self.rng.integers(1, len(self.topology)))
         return s, t
+
+    def run_batch(self, batch_index, batch_size, source, sink):
+        """
+        Runs batch_size simulations with the random number stream of the given batch of the current run and returns
+        their results as a dictionary of lists, without storing them. source and sink are only used on a fixed topology.
+        """
+        self.rng = np.random.default_rng(self.spawn_seed(BATCH_STREAM, self.run_index, batch_index))
+        results = {"link_failure": [], "disconnected_components": [], "max_flow": [], "shortest_path": [], "num_nodes": [],
+                   "graphs": [], "path_destinations": [], "path_distances": [], "gomory_hu_parent": [],
+                   "gomory_hu_weight": []}
+
+        # A fixed topology has the same links in every simulation, so the failures of the whole batch are sampled at
+        # once. On a randomized topology only the failure rates can be sampled ahead of the topologies.
+        num_components = None
+        with self.phase("failure_sampling"):
+            if self.randomize_num_nodes:
+                link_failures = self.sample_link_failure_rates(batch_size)
+            elif self.percolation:
+                link_failures, masks, num_components = self.sample_percolation_batch(batch_size)
+            else:
+                link_failures, masks = self.sample_link_failure_batch(batch_size)
+
+        # The topology is never changed by a simulation. The links that fail in a simulation are only masked out
+        # in a view of the topology that the algorithms run on.
+        for i in range(batch_size):
+            if self.randomize_num_nodes:
+                with self.phase("topology_generation"):
+                    self.topology = self.generate_topology()
+                if self.keep_graphs:
+                    # A shallow copy shares the arrays of the compact graph but not the adjacency lists that the
+                    # algorithms cache on it, which are only needed during the simulation
+                    results["graphs"].append(copy.copy(self.topology.get_compact_graph()))
+                source, sink = self.get_random_source_sink()
+                with self.phase("failure_sampling"):
+                    mask = self.failure_model.sample_masks(self.topology, link_failures[i:i+1], self.rng)[0]
+                graph = self.topology.get_compact_graph().with_failures(mask)
+            else:
+                graph = self.topology.get_compact_graph().with_failures(masks[i])
+            results["link_failure"].append(float(link_failures[i]))
+            # The adjacency lists of the view are only built once an algorithm that needs them runs, and are timed as
+            # part of its phase
+            results["num_nodes"].append(len(self.topology))
+            if num_components is not None:
+                results["disconnected_components"].append(num_components[i])
+            else:
+                with self.phase("disconnected_components"):
+                    results["disconnected_components"].append(self.simulate_disconnected_components(graph))
+            if self.all_pairs_max_flow:
+                with self.phase("gomory_hu_tree"):
+                    flow, parent, weight = self.simulate_gomory_hu_tree(graph, source, sink)
+                results["max_flow"].append(flow)
+                results["gomory_hu_parent"].append(parent)
+                results["gomory_hu_weight"].append(weight)
+            elif self.warm_start_max_flow and not self.randomize_num_nodes:
+                with self.phase("max_flow"):
+                    results["max_flow"].append(self.get_warm_start(source, sink).max_flow(masks[i]))
+            else:
+                with self.phase("max_flow"):
+                    results["max_flow"].append(self.simulate_max_flow(graph, source, sink))
+            with self.phase("shortest_path"):
+                if self.destinations is None and self.cached_shortest_path and not self.randomize_num_nodes:
+                    _, weight = self.get_cached_tree(source).shortest_path(graph, sink)
+                    results["shortest_path"].append(weight)
+                elif self.destinations is None:
+                    results["shortest_path"].append(self.simulate_shortest_path(graph, source, sink))
+                else:
+                    weight, destinations, distances = self.simulate_shortest_path_tree(graph, source, sink)
+                    results["shortest_path"].append(weight)
+                    if destinations is not None:
+                        results["path_destinations"].append(destinations)
+                    results["path_distances"].append(distances)
+
+        if self.phase_timer is not None:
+            self.phase_timer.count("simulations", batch_size)
+        return results
+
+    def store_results(self, results):
+        """
+        Appends the results of a batch returned by run_batch to the results of the simulation, or writes them to the
+        result sink if the simulation has one. The graphs of randomized topologies are not kept when writing to a sink.
+        Raises an exception if the batch records other paths or Gomory-Hu trees than the results it would be stored
+        with, such as a run with destinations after one without.
+        """
+        if "phase_timer" in results:
+            self.phase_timer.merge(results["phase_timer"])
+        if self.result_sink is not None:
+            self.result_sink.write(results)
+            return
+        if self.link_failure_samples:
+            check_matrix_widths({column: len(rows[0]) for column, rows in self.get_matrix_rows() if rows},
+                                get_matrix_widths(results))
+        self.link_failure_samples.extend(results["link_failure"])
+        self.disconnected_components_result.extend(results["disconnected_components"])
+        self.max_flow_result.extend(results["max_flow"])
+        self.shortest_path_result.extend(results["shortest_path"])
+        self.original_graphs.extend(results["graphs"])
+        self.path_destinations.extend(results["path_destinations"])
+        self.path_distances.extend(results["path_distances"])
+        self.gomory_hu_parents.extend(results["gomory_hu_parent"])
+        self.gomory_hu_weights.extend(results["gomory_hu_weight"])
+
+    def get_results(self):
+        """
+        Returns the results of the simulations as a dictionary with an array for every column in
+        result_sink.RESULT_COLUMNS. If the results are stored in a result sink, the arrays are read back from it.
+        """
+        if self.result_sink is not None:
+            return self.result_sink.read()
+
+        if self.randomize_num_nodes:
+            num_nodes = [result[1] for result in self.max_flow_result]
+        else:
+            num_nodes = [len(self.original_graphs[0])] * len(self.max_flow_result)
+        results = results_to_columns({
+            "link_failure": self.link_failure_samples,
+            "disconnected_components": self.disconnected_components_result,
+            "max_flow": self.max_flow_result,
+            "shortest_path": self.shortest_path_result,
+            "num_nodes": num_nodes,
+        })
+        for column, rows in self.get_matrix_rows():
+            if rows:
+                results[column] = np.array(rows, dtype=MATRIX_COLUMNS[column])
+        return results
+
+    def get_matrix_rows(self):
+        """
+        Returns the (column, list of rows) of every column in result_sink.MATRIX_COLUMNS kept in the result lists.
+        """
+        return [("path_destinations", self.path_destinations), ("path_distances", self.path_distances),
+                ("gomory_hu_parent", self.gomory_hu_parents), ("gomory_hu_weight", self.gomory_hu_weights)]
     
-    def simulate(self):
+    def simulate(self, workers=1, percolation=False, result_sink=None, checkpoint_interval=None, phase_timer=None,
+                 failure_model=None, destinations=None, all_pairs_max_flow=False, warm_start_max_flow=False,
+                 cached_shortest_path=False):
         """
         Runs self.num_sims number of simulations. If the self.randomize_num_nodes is true, then it will generate a new
         topology to simulate on each iteration. Otherwise, it will simulate on the same topology every iteration.
+
+        If workers is greater than 1, the batches of simulations are spread across that many worker processes. The
+        results are the same for a given seed regardless of the number of workers. Calling simulate again on the same
+        simulation appends new simulations rather than repeating the ones of the first call.
+
+        If percolation is true and the topology is fixed, the link failures of each batch are drawn from one random
+        order of the links and the numbers of disconnected components come from a single union-find sweep over it (see
+        sample_percolation_batch) instead of one search per simulation.
+
+        If a result_sink is given (see result_sink.py), the results are streamed to it instead of being kept in the
+        result lists, and the visualize methods read them back from it.
+
+        If checkpoint_interval is given, the progress of the run is checkpointed to the directory of the result sink at
+        most every checkpoint_interval seconds, so that an interrupted run can be continued with resume. This requires
+        a ColumnarResultSink.
+
+        If a phase_timer is given (see profiling.py), the time spent in each phase of the simulations is recorded in it
+        and summarized at the end of the run.
+
+        If a failure_model is given (see failure_models.py), it replaces the simulation's failure model, which decides
+        how links fail. By default every link fails independently.
+
+        If destinations is given, the shortest paths of each simulation are found with one shortest path tree from the
+        source instead of a search to the sink only, and the weights of the paths to several destinations are recorded
+        in the path_distances result, with a row per simulation. If destinations is "all", the row holds the weight of
+        the path to every node, which requires a fixed topology. If it is a number K, the row holds the weights of the
+        paths to K destinations drawn at random for each simulation, which are recorded in the path_destinations
+        result. The weight of a path to a node that can't be reached is -1.
+
+        If all_pairs_max_flow is true, the Gomory-Hu tree of every simulation is found with n - 1 maximum flows and
+        recorded in the gomory_hu_parent and gomory_hu_weight results, with a row per simulation. The maximum flow
+        between any two nodes of a simulation can then be read from its tree with the functions in
+        algorithms/gomory_hu.py. This requires a fixed topology.
+
+        If warm_start_max_flow is true and the topology is fixed, the maximum flow of every simulation starts from the
+        maximum flow of the intact topology instead of from zero (see algorithms/max_flow.py WarmStartMaxFlow). A
+        simulation whose failed links carried none of that flow costs next to nothing, so this pays off when few links
+        fail. The results are the same either way.
+
+        Similarly, if cached_shortest_path is true and the topology is fixed, the shortest path tree of the intact
+        topology is kept (see algorithms/shortest_path.py CachedShortestPathTree). A simulation where the path to the
+        sink in the tree survived needs no search at all, and otherwise only the part of the tree below the failed links
+        is searched again. This has no effect when destinations is given.
+        """
+        self.set_trial_options(destinations, all_pairs_max_flow, warm_start_max_flow, cached_shortest_path)
+        self.set_failure_model(failure_model, percolation)
+        if phase_timer is not None:
+            self.phase_timer = phase_timer
+        if result_sink is not None:
+            self.result_sink = result_sink
+        if checkpoint_interval is not None and not isinstance(self.result_sink, ColumnarResultSink):
+            raise Exception("Checkpointing requires a ColumnarResultSink")
+
+        self.start_run()
+        self.run_simulations(0, workers, checkpoint_interval)
+
+    def set_trial_options(self, destinations=None, all_pairs_max_flow=False, warm_start_max_flow=False,
+                          cached_shortest_path=False):
+        """
+        Sets what every simulation of the run that is starting records and how it finds its results (see simulate).
+        Every run sets all of them, so an option given to one run never carries over to the next.
+        """
+        if destinations == "all" and self.randomize_num_nodes:
+            raise Exception("Recording the paths to all destinations requires a fixed topology")
+        if destinations is not None and destinations != "all" and (not isinstance(destinations, int) or destinations < 1):
+            raise Exception("destinations must be \"all\" or a positive number")
+        if all_pairs_max_flow and self.randomize_num_nodes:
+            raise Exception("Recording the maximum flow between all pairs of nodes requires a fixed topology")
+        self.destinations = destinations
+        self.all_pairs_max_flow = all_pairs_max_flow
+        self.warm_start_max_flow = warm_start_max_flow
+        self.cached_shortest_path = cached_shortest_path
+
+    def set_failure_model(self, failure_model, percolation):
+        """
+        Sets the failure model, if one is given, and whether to sample percolation batches. Percolation batches can only
+        be sampled with independent link failures.
+        """
+        if failure_model is not None:
+            self.failure_model = failure_model
+        if percolation and type(self.failure_model) is not LinkFailureModel:
+            raise Exception("Percolation requires independent link failures")
+        self.percolation = percolation
+
+    def resume(self, result_sink, workers=1, checkpoint_interval=None):
+        """
+        Continues a run of simulate that was checkpointed to the directory of result_sink, a ColumnarResultSink opened
+        with append=True. Results written after the last checkpoint are discarded and the run continues from the first
+        batch that wasn't checkpointed, using the seed of the checkpointed run, so the final results are the same as
+        if the run had never been interrupted. The failure model is not checkpointed, so the simulation must have the
+        same failure model as the checkpointed run.
+        """
+        checkpoint = read_checkpoint(result_sink.directory)
+        if (checkpoint["graph_name"] != self.graph_name or checkpoint["num_sims"] != self.num_sims
+                or checkpoint["randomize_num_nodes"] != self.randomize_num_nodes):
+            raise Exception("The checkpoint belongs to a different simulation")
+
+        seed_sequence = np.random.SeedSequence(checkpoint["entropy"], spawn_key=tuple(checkpoint["spawn_key"]))
+        if seed_sequence.entropy != self.seed_sequence.entropy or seed_sequence.spawn_key != self.seed_sequence.spawn_key:
+            self.seed_sequence = seed_sequence
+            self.rng = np.random.default_rng(self.spawn_seed(TOPOLOGY_STREAM))
+            # Rebuild the topology the checkpointed run simulated on, unless it was passed in
+            if not self.topology_given:
+                self.topology = self.generate_topology()
+                if not self.randomize_num_nodes:
+                    self.original_graphs = [self.topology.get_compact_graph()]
+        if not self.randomize_num_nodes and checkpoint["num_nodes"] != len(self.topology):
+            raise Exception("The checkpoint belongs to a different simulation")
+
+        self.percolation = checkpoint["percolation"]
+        self.destinations = checkpoint.get("destinations")
+        self.all_pairs_max_flow = checkpoint.get("all_pairs_max_flow", False)
+        self.warm_start_max_flow = checkpoint.get("warm_start_max_flow", False)
+        self.cached_shortest_path = checkpoint.get("cached_shortest_path", False)
+        self.result_sink = result_sink
+        self.run_index = checkpoint.get("run_index", 0)
+        self.num_runs = max(self.num_runs, self.run_index + 1)
+        result_sink.truncate(checkpoint["num_rows"])
+
+        self.run_simulations(checkpoint["completed_batches"], workers, checkpoint_interval)
+
+    def simulate_adaptive(self, target_precision, max_seconds=None, num_bins=DEFAULT_NUM_BINS, confidence=0.95,
+                          min_samples_per_bin=30, relative=False, workers=1, percolation=False, result_sink=None,
+                          phase_timer=None, failure_model=None, destinations=None, all_pairs_max_flow=False,
+                          warm_start_max_flow=False, cached_shortest_path=False):
+        """
+        Runs simulations in batches until every metric has converged, instead of always running self.num_sims
+        simulations, which becomes the most that are run.
+
+        The results of each metric are grouped into num_bins bins of link failure rate between the low and high of the
+        failure model, and the running mean and variance of every bin are kept in self.binned_stats (see
+        online_stats.py). The run stops as soon as every bin of every metric has at least min_samples_per_bin results
+        and a confidence interval of its mean no wider than target_precision on each side (or target_precision times the
+        mean if relative is true), or once max_seconds have passed. The other arguments are the same as for simulate.
+        Returns true if the run converged.
+
+        Percolation is not supported, since the simulations of a percolation batch share one order of the links and are
+        not independent, which the confidence intervals assume.
+        """
+        if percolation:
+            raise Exception("simulate_adaptive can't use percolation, whose simulations are not independent")
+        self.set_trial_options(destinations, all_pairs_max_flow, warm_start_max_flow, cached_shortest_path)
+        self.set_failure_model(failure_model, percolation)
+        if result_sink is not None:
+            self.result_sink = result_sink
+        if phase_timer is not None:
+            self.phase_timer = phase_timer
+        # Bin over the rates the failure model can draw, so that no bin stays empty and keeps the run from converging
+        self.binned_stats = {metric: BinnedRunningStats(num_bins, self.failure_model.low, self.failure_model.high)
+                             for metric in METRICS}
+        start_time = time.time()
+        converged = False
+
+        def should_stop(results):
+            nonlocal converged
+            columns = results_to_columns(results)
+            for metric, stats in self.binned_stats.items():
+                stats.add(columns["link_failure"], columns[metric])
+            converged = all(stats.is_converged(target_precision, confidence, min_samples_per_bin, relative)
+                            for stats in self.binned_stats.values())
+            return converged or (max_seconds is not None and time.time() - start_time >= max_seconds)
+
+        self.start_run()
+        self.run_simulations(0, workers, None, should_stop)
+        num_run = int(sum(stats.counts().sum() for stats in self.binned_stats.values()) // len(METRICS))
+        print("*** " + ("Converged" if converged else "Did not converge") + " after " + str(num_run) + " simulations")
+        return converged
+
+    def iter_simulate(self, workers=1, percolation=False, phase_timer=None, failure_model=None, summary=None,
+                      warm_start_max_flow=False, cached_shortest_path=False):
+        """
+        Runs self.num_sims simulations like simulate, but yields a TrialRecord with the results of every simulation as
+        soon as its batch is done instead of storing them, so a run of any length can be monitored in constant memory.
+        Only the results in result_sink.RESULT_COLUMNS are recorded, so neither the paths to several destinations nor
+        the Gomory-Hu trees can be. The records are the same as the results of simulate for the same seed, in the same
+        order, regardless of the number of workers.
+
+        If a summary is given (see online_stats.py OnlineSummary), every batch is added to it before its records are
+        yielded, so it always holds the running mean, variance, quantiles and per link failure rate histograms of every
+        metric so far.
+
+        Stopping the iteration early, for example with break, cancels the batches that have not started yet. The other
+        arguments are the same as for simulate.
+        """
+        self.set_trial_options(warm_start_max_flow=warm_start_max_flow, cached_shortest_path=cached_shortest_path)
+        self.set_failure_model(failure_model, percolation)
+        if phase_timer is not None:
+            self.phase_timer = phase_timer
+        self.start_run()
+        self.keep_graphs = False
+        s, t = self.pick_source_sink()
+
+        for _, results in self.iter_batch_results(self.get_batches(), s, t, workers):
+            if "phase_timer" in results:
+                self.phase_timer.merge(results["phase_timer"])
+            columns = results_to_columns(results)
+            if summary is not None:
+                summary.add(columns)
+            for record in zip(*(columns[column].tolist() for column in RESULT_COLUMNS)):
+                yield TrialRecord(*record)
+
+    def estimate_rare_event(self, failure_rate, event=DISCONNECTION, threshold=None, num_samples=10000,
+                            num_pilot_samples=1000, confidence=0.95):
+        """
+        Estimates the probability of a rare event on the fixed topology when every link fails independently with
+        failure_rate, with importance sampling instead of plain simulations (see rare_events.py). The event is either
+        rare_events.DISCONNECTION, the random source and sink of the simulation being disconnected, or
+        rare_events.COMPONENTS, the topology falling apart into at least threshold disconnected components.
+
+        The sampled link failure rates are first fitted to the event with samples of num_pilot_samples, after which
+        num_samples samples give the estimate. Returns a rare_events.RareEventEstimate with the probability and the half
+        width of its confidence interval. A confidence interval about as wide as the probability means the fit missed
+        some of the ways the event happens, and more pilot samples are needed. Events that are not rare are estimated
+        better by plain simulations, which the variance_reduction of the estimate shows by being below 1.
+        """
+        if self.randomize_num_nodes:
+            raise Exception("Estimating a rare event requires a fixed topology")
+        s, t = self.pick_source_sink()
+        score, target = get_event_score(event, s, t, threshold)
+        sampler = ImportanceSampler(self.topology.get_compact_graph(), failure_rate, score, target)
+        rng = np.random.default_rng(self.spawn_seed(RARE_EVENT_STREAM))
+        with self.phase("rare_event_fitting"):
+            if not sampler.fit(rng, num_pilot_samples):
+                print("*** The sampled link failure rates did not reach the event, the estimate may be unreliable")
+        with self.phase("rare_event_sampling"):
+            return sampler.estimate(rng, num_samples, confidence)
+
+    def write_checkpoint(self, completed_batches):
+        """
+        Flushes the result sink and checkpoints the run after the given number of batches. The random number streams
+        of the batches only depend on the seed, the run index and their index, so those are all of the random state to
+        keep.
+        """
+        self.result_sink.flush()
+        write_checkpoint(self.result_sink.directory, {
+            "graph_name": self.graph_name,
+            "num_sims": self.num_sims,
+            "randomize_num_nodes": self.randomize_num_nodes,
+            "num_nodes": len(self.topology),
+            "percolation": self.percolation,
+            "destinations": self.destinations,
+            "all_pairs_max_flow": self.all_pairs_max_flow,
+            "warm_start_max_flow": self.warm_start_max_flow,
+            "cached_shortest_path": self.cached_shortest_path,
+            "entropy": self.seed_sequence.entropy,
+            "spawn_key": list(self.seed_sequence.spawn_key),
+            "run_index": self.run_index,
+            "completed_batches": completed_batches,
+            "num_rows": self.result_sink.num_rows,
+        })
+
+    def get_batches(self):
+        """
+        Returns the (batch_index, batch_size) of every batch of simulations.
+        """
+        return [(batch_index, min(SAMPLE_BATCH_SIZE, self.num_sims - start))
+                for batch_index, start in enumerate(range(0, self.num_sims, SAMPLE_BATCH_SIZE))]
+
+    def iter_batch_results(self, batches, source, sink, workers=1):
+        """
+        Runs the given batches, in worker processes if workers is greater than 1, and yields the (batch_index, results)
+        of each batch in the order of the batches.
+        """
+        if workers > 1:
+            with SharedTopologyStore() as store, \
+                 ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                                     initargs=self.get_worker_copy(store)) as executor:
+                # Only a few batches per worker are submitted ahead, so that the results waiting to be yielded stay
+                # bounded and stopping early wastes little work
+                pending = deque()
+                try:
+                    for batch_index, batch_size in batches:
+                        pending.append((batch_index, executor.submit(run_batch_in_worker, batch_index, batch_size,
+                                                                     source, sink)))
+                        if len(pending) >= BATCHES_IN_FLIGHT_PER_WORKER * workers:
+                            batch_index, future = pending.popleft()
+                            yield batch_index, future.result()
+                    # Results are yielded in the order of the batches, not in the order the workers finish them
+                    while pending:
+                        batch_index, future = pending.popleft()
+                        yield batch_index, future.result()
+                finally:
+                    for _, future in pending:
+                        future.cancel()
+        else:
+            for batch_index, batch_size in batches:
+                yield batch_index, self.run_batch(batch_index, batch_size, source, sink)
+
+    def get_worker_copy(self, store):
+        """
+        Returns a copy of the simulation to send to the worker processes, without its results or anything else the
+        workers don't need, along with the SharedGraphHandle of its topology, for init_worker. A fixed topology is
+        published to the shared topology store instead of being copied, so the workers attach to a single copy of its
+        compact graph and don't receive its adjacency matrix at all.
+        """
+        worker_copy = copy.copy(self)
+        worker_copy.link_failure_samples = []
+        worker_copy.shortest_path_result = []
+        worker_copy.max_flow_result = []
+        worker_copy.disconnected_components_result = []
+        worker_copy.original_graphs = []
+        worker_copy.path_destinations = []
+        worker_copy.path_distances = []
+        worker_copy.gomory_hu_parents = []
+        worker_copy.gomory_hu_weights = []
+        worker_copy.binned_stats = None
+        worker_copy.warm_start = None
+        worker_copy.cached_tree = None
+        worker_copy.result_sink = None
+        if self.randomize_num_nodes:
+            return worker_copy, None
+
+        shared_graph = store.publish(self.topology.get_compact_graph())
+        worker_copy.topology = copy.copy(self.topology)
+        worker_copy.topology.graph = None
+        worker_copy.topology.compact_graph = None
+        return worker_copy, shared_graph
+
+    def pick_source_sink(self):
+        """
+        Returns the random source and sink of a run, which are drawn from their own stream of the seed so that every
+        run with the same seed uses the same ones.
+        """
+        self.rng = np.random.default_rng(self.spawn_seed(SOURCE_SINK_STREAM))
+        return self.get_random_source_sink()
+
+    def run_simulations(self, first_batch, workers, checkpoint_interval, should_stop=None):
+        """
+        Runs and stores every batch of simulations from first_batch onwards. If should_stop is given, it is called with
+        the results of every batch after they are stored and the run stops early once it returns true.
         """
+        from progress.bar import Bar
         start_time = time.time()
         
+        self.keep_graphs = self.result_sink is None
         # Picking a random source and sink.
-        s, t = self.get_random_source_sink()
+        s, t = self.pick_source_sink()
+
+        batches = self.get_batches()
+        if checkpoint_interval is not None:
+            # Checkpoint the start of the run, so that an interruption before the first interval has passed resumes
+            # this run rather than an older one
+            self.write_checkpoint(first_batch)
+        last_checkpoint = time.time()
         
         with Bar("Running " + str(self.num_sims) + " simulations on a " + self.graph_name, max=self.num_sims) as bar:
-            for i in range(self.num_sims):
-                if self.randomize_num_nodes:
-                    s, t = self.get_random_source_sink()
-
-                self.sample_link_failure()
-                self.simulate_disconnected_components()
-                self.simulate_max_flow(s, t)
-                self.simulate_shortest_path(s, t)
-                
-                if self.randomize_num_nodes:
-                    self.topology = self.generate_topology()
-                    self.original_graphs.append(copy.deepcopy(self.topology.graph))
-                else:
-                    self.topology.graph = copy.deepcopy(self.original_graphs[0]) # use deep copy to avoid copying by reference
-            
-                bar.next()
+            bar.goto(sum(batch_size for _, batch_size in batches[:first_batch]))
+            for batch_index, results in self.iter_batch_results(batches[first_batch:], s, t, workers):
+                with self.phase("storing_results"):
+                    self.store_results(results)
+                bar.next(len(results["link_failure"]))
+                if checkpoint_interval is not None and time.time() - last_checkpoint >= checkpoint_interval:
+                    with self.phase("checkpointing"):
+                        self.write_checkpoint(batch_index + 1)
+                    last_checkpoint = time.time()
+                if should_stop is not None and should_stop(results):
+                    break
+
+        if self.result_sink is not None:
+            self.result_sink.flush()
+        if checkpoint_interval is not None:
+            self.write_checkpoint(len(batches))
                   
         print("*** Total Runtime: " + str(round(time.time()-start_time, 2)) + "s")
+        if self.phase_timer is not None:
+            self.phase_timer.print_summary()
         print("")
 
+    def write_quantile_plot(self, x, y, title, x_label, y_label, path):
+        """
+        Writes a plot of the quantiles of y in bins of x to an html file: the median as a line, with shaded bands
+        between the 25th and 75th and between the 5th and 95th percentiles. The size of the file only depends on the
+        number of bins, not on the number of simulations.
+        """
+        import plotly.graph_objects as go
+        edges = get_bin_edges(0, 1, NUM_LINK_FAILURE_BINS)
+        counts, quantiles = binned_quantiles(x, y, edges, PLOT_QUANTILES)
+        centers = get_bin_centers(edges)[counts > 0]
+        quantiles = quantiles[:, counts > 0]
+
+        fig = go.Figure()
+        # The bands are drawn by filling the area between each lower quantile and the matching upper quantile
+        for lower, upper, name in [(0, 4, "5th - 95th percentile"), (1, 3, "25th - 75th percentile")]:
+            fig.add_trace(go.Scatter(x=centers, y=quantiles[lower], mode="lines", line=dict(width=0),
+                                     showlegend=False, hoverinfo="skip"))
+            fig.add_trace(go.Scatter(x=centers, y=quantiles[upper], mode="lines", line=dict(width=0), fill="tonexty",
+                                     fillcolor='rgba(12,51,131,0.2)', name=name))
+        fig.add_trace(go.Scatter(x=centers, y=quantiles[2], mode="lines", line=dict(color='rgb(12,51,131)'),
+                                 name="Median", customdata=counts[counts > 0],
+                                 hovertemplate="%{x:.3f}: %{y} (%{customdata} simulations)"))
+        fig.update_layout(title=title, xaxis_title=x_label, yaxis_title=y_label)
+        fig.write_html(path)
+
+    def write_heatmap(self, x, y, title, x_label, y_label, path):
+        """
+        Writes a heat map of the number of simulations in bins of x and y to an html file.
+        """
+        import plotly.graph_objects as go
+        x_edges = get_bin_edges(0, 1, NUM_LINK_FAILURE_BINS // 2)
+        y_edges = get_integer_bin_edges(y, NUM_VALUE_BINS)
+        counts = histogram_2d(x, y, x_edges, y_edges)
+
+        fig = go.Figure(data=[go.Heatmap(x=get_bin_centers(x_edges),
+                                         y=get_bin_centers(y_edges),
+                                         z=counts.T,
+                                         colorscale=[[0, 'rgb(225,231,242)'], [1, 'rgb(12,51,131)']])])
+        fig.update_layout(title=title, xaxis_title=x_label, yaxis_title=y_label)
+        fig.write_html(path)
+
+    def write_binned_mesh(self, num_nodes, link_failure, z, z_label, path, color=None):
+        """
+        Writes a 3D mesh of the mean of z in bins of the number of nodes and the link failure rate to an html file.
+        Only bins with at least one simulation are part of the mesh.
+        """
+        import plotly.graph_objects as go
+        node_edges = get_integer_bin_edges(num_nodes, NUM_NODE_BINS)
+        failure_edges = get_bin_edges(0, 1, NUM_LINK_FAILURE_BINS // 2)
+        counts, means = binned_means_2d(num_nodes, link_failure, z, node_edges, failure_edges)
+        node_centers, failure_centers = np.meshgrid(get_bin_centers(node_edges), get_bin_centers(failure_edges),
+                                                    indexing="ij")
+        nonempty = counts > 0
+
+        fig = go.Figure(data=[go.Mesh3d(x=node_centers[nonempty],
+                        y=failure_centers[nonempty],
+                        z=means[nonempty],
+                        opacity=0.5,
+                        color=color
+                        )])
+        fig.update_layout(scene = dict(
+                          xaxis_title='Number of Nodes',
+                          yaxis_title='Link Failure Rate',
+                          zaxis_title=z_label))
+        fig.write_html(path)
+
     def visualize_disconnected_components(self):
         """
         Generates a graph of the results of the simulations on disconnected components and stores them in the results/disconnected_components 
         folder. If self.randomize_num_nodes is true, then it will generate a 3D Mesh of the results, otherwise it will generate a heat map 
-        and scatterplot of the results.
+        and a plot of the quantiles of the results.
         """
         graph_title = "Disconnected Components After Sampling Link Failure in a " + self.graph_name
+        results = self.get_results()
         
         if self.randomize_num_nodes:
-            disconnected_components = [result[0] for result in self.disconnected_components_result]
-            total_nodes = [result[1] for result in self.disconnected_components_result]
-
-            fig = go.Figure(data=[go.Mesh3d(x=total_nodes,
-                            y=self.link_failure_samples,
-                            z=disconnected_components,
-                            opacity=0.5,
-                            color='rgba(12,51,131,0.6)'
-                            )])            
-                  
-            fig.write_html(os.path.join(RESULTS_DIR["disconnected_components"], self.graph_name + "__Disconnected_Components_3D_Mesh.html"))
+            self.write_binned_mesh(results["num_nodes"], results["link_failure"], results["disconnected_components"],
+                                   "# of Disconnected Components",
+                                   os.path.join(RESULTS_DIR["disconnected_components"], self.graph_name + "__Disconnected_Components_3D_Mesh.html"),
+                                   color='rgba(12,51,131,0.6)')
 
         else:
-            # Making the scatter plot
-            fig = px.scatter(x=self.link_failure_samples, 
-                            y=self.disconnected_components_result,
-                            labels=dict(x="Link Failure Rate", y="# of Disconnected Components"),
-                            title=graph_title)
-            
-            fig.write_html(os.path.join(RESULTS_DIR["disconnected_components"], self.graph_name + "_Disconnected_Components_Scatterplot.html"))
-            
-            # Making the heat map
-            grouping_factor = 2
-            num_bins_x = 100 // grouping_factor
-            num_bins_y = max(self.disconnected_components_result) // grouping_factor
-            color_scale = [ 'rgb(225,231,242)', 'rgb(12,51,131)']
-            
-            fig = px.density_heatmap(x=self.link_failure_samples, 
-                                    y=self.disconnected_components_result, 
-                                    nbinsx=num_bins_x, 
-                                    nbinsy=num_bins_y,
-                                    labels=dict(x="Link Failure Rate", y="# of Disconnected Components"),
-                                    title=graph_title)
-        
-            fig.write_html(os.path.join(RESULTS_DIR["disconnected_components"], self.graph_name + "_Disconnected_Components_Heatmap.html"))
+            self.write_quantile_plot(results["link_failure"], results["disconnected_components"], graph_title,
+                                     "Link Failure Rate", "# of Disconnected Components",
+                                     os.path.join(RESULTS_DIR["disconnected_components"], self.graph_name + "_Disconnected_Components_Scatterplot.html"))
+            self.write_heatmap(results["link_failure"], results["disconnected_components"], graph_title,
+                               "Link Failure Rate", "# of Disconnected Components",
+                               os.path.join(RESULTS_DIR["disconnected_components"], self.graph_name + "_Disconnected_Components_Heatmap.html"))
 
     def visualize_max_flow(self):
         """
         Generates a graph of the results of the simulations on maximum flow and stores them in the results/max_flow folder. If 
-        self.randomize_num_nodes is true, then it will generate a 3D Mesh of the results, otherwise it will generate a scatterplot of 
-        the results.
+        self.randomize_num_nodes is true, then it will generate a 3D Mesh of the results, otherwise it will generate a plot of the
+        quantiles of the results.
         """
         graph_title = "The maximum flow in a " + self.graph_name
+        results = self.get_results()
 
         if self.randomize_num_nodes:
-            flows = [max_flow_res[0] for max_flow_res in self.max_flow_result]
-            total_nodes = [max_flow_res[1] for max_flow_res in self.max_flow_result]
-
-            fig = go.Figure(data=[go.Mesh3d(x=total_nodes,
-                            y=self.link_failure_samples,
-                            z=flows,
-                            opacity=0.5,
-                            color='rgba(12,51,131,0.6)'
-                            )])
-            fig.update_layout(scene = dict(
-                              xaxis_title='Number of Nodes',
-                              yaxis_title='Link Failure Rate',
-                              zaxis_title='Maximum Flow'))
-            fig.write_html(os.path.join(RESULTS_DIR["max_flow"], self.graph_name + "_rand_nodes_max_flow.html"))  
+            self.write_binned_mesh(results["num_nodes"], results["link_failure"], results["max_flow"], "Maximum Flow",
+                                   os.path.join(RESULTS_DIR["max_flow"], self.graph_name + "_rand_nodes_max_flow.html"),
+                                   color='rgba(12,51,131,0.6)')
         else:
-            fig = px.scatter(x=self.link_failure_samples, 
-                             y=self.max_flow_result, 
-                             title=graph_title, 
-                             labels={
-                                  "x": "Link Failure Rate",
-                                  "y": "Maximum Flow"
-                            })
-            fig.write_html(os.path.join(RESULTS_DIR["max_flow"], self.graph_name + "_max_flow.html"))
+            self.write_quantile_plot(results["link_failure"], results["max_flow"], graph_title,
+                                     "Link Failure Rate", "Maximum Flow",
+                                     os.path.join(RESULTS_DIR["max_flow"], self.graph_name + "_max_flow.html"))
     
     
     def visualize_shortest_path(self):
         """
         Generates a graph of the results of the simulations on shortest path and stores them in the results/shortest_path folder. If 
-        self.randomize_num_nodes is true, then it will generate a 3D Mesh of the results, otherwise it will generate a scatterplot of 
-        the results.
+        self.randomize_num_nodes is true, then it will generate a 3D Mesh of the results, otherwise it will generate a plot of the
+        quantiles of the results.
         """
+        results = self.get_results()
+
         if self.randomize_num_nodes:
-            sp_weights = [sp_result[0] for sp_result in self.shortest_path_result]
-            num_nodes = [sp_result [1] for sp_result in self.shortest_path_result]
-
-            fig = go.Figure(data=[go.Mesh3d(x=num_nodes, 
-                            y=self.link_failure_samples, 
-                            z=sp_weights, 
-                            opacity=0.5)])
-            fig.update_layout(scene = dict(
-                              xaxis_title='Number of Nodes',
-                              yaxis_title='Link Failure Rate',
-                              zaxis_title='Weight of Shortest Path'))
-            fig.write_html(os.path.join(RESULTS_DIR["shortest_path"], self.graph_name + "_SP_3D_Mesh.html"))
+            self.write_binned_mesh(results["num_nodes"], results["link_failure"], results["shortest_path"],
+                                   "Weight of Shortest Path",
+                                   os.path.join(RESULTS_DIR["shortest_path"], self.graph_name + "_SP_3D_Mesh.html"))
         else:
-            fig = px.scatter(x=self.link_failure_samples, y=self.shortest_path_result, title=self.graph_name + " - Link Failure Rate VS Shortest Path Weight")
-            fig.update_layout(xaxis_title="Link Failure Rate", yaxis_title="Weight of Shortest path")
-            # fig = px.density_heatmap(x=self.link_failure_samples,
-            #                          y=self.shortest_path_result, title=self.graph_name + " - Link Failure Rate VS Shortest Path Length",
-            #                          labels={
-            #                              "x": "Link Failure Rate",
-            #                              "y": "Length of Shortest path"
-            #                          })
-            fig.write_html(os.path.join(RESULTS_DIR["shortest_path"], self.graph_name + "_SP.html") )
+            self.write_quantile_plot(results["link_failure"], results["shortest_path"],
+                                     self.graph_name + " - Link Failure Rate VS Shortest Path Weight",
+                                     "Link Failure Rate", "Weight of Shortest path",
+                                     os.path.join(RESULTS_DIR["shortest_path"], self.graph_name + "_SP.html"))
     
     def visualize_simulation(self):
         """
@@ -271,6 +930,32 @@ class Simulation(ABC):
         self.visualize_max_flow()
         self.visualize_shortest_path()
 
+# The simulation a worker process runs its batches on. It is sent to each worker once when the worker starts.
+worker_simulation = None
+
+def init_worker(simulation, shared_graph=None):
+    """
+    Initializes a worker process with the simulation to run batches on, attaching its topology's compact graph from
+    shared memory if a SharedGraphHandle is given (see Simulation.get_worker_copy).
+    """
+    global worker_simulation
+    worker_simulation = simulation
+    if shared_graph is not None:
+        simulation.topology.compact_graph = attach(shared_graph)
+    if simulation.phase_timer is not None:
+        # Only the timings of the worker's own batches are sent back
+        simulation.phase_timer.reset()
+
+def run_batch_in_worker(batch_index, batch_size, source, sink):
+    """
+    Runs a batch of simulations in a worker process and returns its results, along with the phase timings of the batch
+    if the simulation has a phase timer.
+    """
+    results = worker_simulation.run_batch(batch_index, batch_size, source, sink)
+    if worker_simulation.phase_timer is not None:
+        results["phase_timer"] = worker_simulation.phase_timer.pop_records()
+    return results
+
 class FullyConnectedTopologySimulation(Simulation):
     """
     A child class of Simulation to simulate Fully Connected Topologies
@@ -279,20 +964,20 @@ class FullyConnectedTopologySimulation(Simulation):
     Otherwise, it creates a topology from the given num_nodes and uses that for every simulation.
     """
     
-    def __init__(self, num_sims, num_nodes) -> None:
+    def __init__(self, num_sims, num_nodes, seed=None, topology_cache=None) -> None:
+        self.num_nodes = num_nodes
         randomize_num_nodes = num_nodes < 1
-        topology = None
-        if not randomize_num_nodes:
-            topology = FullyConnectedTopology(num_nodes)
             
-        super().__init__(num_sims, topology, "Fully_Connected_Topology", randomize_num_nodes)
+        super().__init__(num_sims, None, "Fully_Connected_Topology", randomize_num_nodes, seed, topology_cache)
         
     def generate_topology(self):
         """
-        Generates a random fully connected topology.
+        Generates a fully connected topology, with a random number of nodes if self.randomize_num_nodes is true.
         """
-        num_nodes = random.randint(MIN_NODES, MAX_NODES)
-        return FullyConnectedTopology(num_nodes)
+        if self.randomize_num_nodes:
+            num_nodes = int(self.rng.integers(MIN_NODES, MAX_NODES + 1))
+            return FullyConnectedTopology(num_nodes, self.rng)
+        return self.get_fixed_topology(FullyConnectedTopology, self.num_nodes)
     
 class ConstantTopologySimulation(Simulation):
     """
@@ -302,21 +987,23 @@ class ConstantTopologySimulation(Simulation):
     Otherwise, it creates a topology from the given num_nodes and links_per_node and uses that for every simulation.
     """
     
-    def __init__(self, num_sims, num_nodes, links_per_node) -> None:
+    def __init__(self, num_sims, num_nodes, links_per_node, seed=None, topology_cache=None) -> None:
+        self.num_nodes = num_nodes
+        self.links_per_node = links_per_node
         randomize_num_nodes = num_nodes < 1 or links_per_node < 1
-        topology = None
-        if not randomize_num_nodes:
-            topology = ConstantTopology(num_nodes, links_per_node)
             
-        super().__init__(num_sims, topology, "Constant_Topology", randomize_num_nodes)
+        super().__init__(num_sims, None, "Constant_Topology", randomize_num_nodes, seed, topology_cache)
         
     def generate_topology(self):
         """
-        Generates a random constant topology.
+        Generates a constant topology, with a random number of nodes and links per node if self.randomize_num_nodes is
+        true.
         """
-        num_nodes = random.randint(MIN_NODES, MAX_NODES)
-        links_per_node = random.randint(MIN_NODES-1, num_nodes-1)
-        return ConstantTopology(num_nodes, links_per_node)
+        if self.randomize_num_nodes:
+            num_nodes = int(self.rng.integers(MIN_NODES, MAX_NODES + 1))
+            links_per_node = int(self.rng.integers(MIN_NODES-1, num_nodes))
+            return ConstantTopology(num_nodes, links_per_node, self.rng)
+        return self.get_fixed_topology(ConstantTopology, self.num_nodes, self.links_per_node)
         
 class ClusteredTopologySimulation(Simulation):
     """
@@ -326,18 +1013,19 @@ class ClusteredTopologySimulation(Simulation):
     Otherwise, it creates a topology from the given num_nodes and num_clusters and uses that for every simulation.
     """
     
-    def __init__(self, num_sims, num_nodes, num_clusters) -> None:
+    def __init__(self, num_sims, num_nodes, num_clusters, seed=None, topology_cache=None) -> None:
+        self.num_nodes = num_nodes
+        self.num_clusters = num_clusters
         randomize_num_nodes = num_nodes < 1 or num_clusters < 1
-        topology = None
-        if not randomize_num_nodes:
-            topology = ClusteredTopology(num_nodes, num_clusters)
          
-        super().__init__(num_sims, topology, "Clustered_Topology", randomize_num_nodes)
+        super().__init__(num_sims, None, "Clustered_Topology", randomize_num_nodes, seed, topology_cache)
         
     def generate_topology(self):
         """
-        Generates a random clustered topology.
+        Generates a clustered topology, with a random number of nodes and clusters if self.randomize_num_nodes is true.
         """
-        num_clusters = random.randint(MIN_CLUSTERS, MAX_CLUSTERS)
-        num_nodes = num_clusters * random.randint(MIN_NODES // MIN_CLUSTERS, MAX_NODES // MAX_CLUSTERS)
-        return ClusteredTopology(num_nodes, num_clusters)
\ No newline at end of file
+        if self.randomize_num_nodes:
+            num_clusters = int(self.rng.integers(MIN_CLUSTERS, MAX_CLUSTERS + 1))
+            num_nodes = num_clusters * int(self.rng.integers(MIN_NODES // MIN_CLUSTERS, MAX_NODES // MAX_CLUSTERS + 1))
+            return ClusteredTopology(num_nodes, num_clusters, self.rng)
+        return self.get_fixed_topology(ClusteredTopology, self.num_nodes, self.num_clusters)
\ No newline at end of file
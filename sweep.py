@@ -0,0 +1,133 @@
+import contextlib
+import io
+import itertools
+import os
+import tempfile
+import time
+import zlib
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from result_sink import ColumnarResultSink, load_results
+from topologies.cache import TopologyCache
+
+def make_grid(simulation_class, *param_values):
+    """
+    Returns the (simulation class, parameters) of every combination of the given parameter values, in the order the
+    simulation class takes its parameters. For example make_grid(ConstantTopologySimulation, [50, 100], [4, 10]) gives
+    the four constant topology simulations with 50 or 100 nodes and 4 or 10 links per node.
+    """
+    return [(simulation_class, params) for params in itertools.product(*param_values)]
+
+def get_cell_name(simulation_class, params):
+    return "_".join([simulation_class.__name__] + [str(param) for param in params])
+
+def run_cell(simulation_class, params, num_sims, seed, topology_cache, simulate_kwargs, output_directory):
+    """
+    Runs the simulations of one cell of a sweep and returns their results and how many seconds they took. If
+    output_directory is given, the results are streamed there instead and None is returned in their place.
+    """
+    start_time = time.time()
+    simulation = simulation_class(num_sims, *params, seed=seed, topology_cache=topology_cache)
+    result_sink = None
+    if output_directory is not None:
+        result_sink = ColumnarResultSink(output_directory)
+    # The progress bars of cells run side by side would overwrite each other, so the sweep reports progress per cell
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        simulation.simulate(result_sink=result_sink, **simulate_kwargs)
+    if result_sink is not None:
+        result_sink.close()
+        return None, time.time() - start_time
+    return simulation.get_results(), time.time() - start_time
+
+
+class Sweep():
+    """
+    A class to represent a parameter sweep: the simulations of every cell of a grid of simulation classes and parameters
+    (see make_grid), each run num_sims times.
+
+    Every cell is seeded from the sweep's seed and its own class and parameters, so the results of a cell don't depend
+    on the other cells or on the order they run in. The parameters of a cell are all parameters of its topology, so no
+    two cells simulate on the same base topology. What is shared is the base topology of each cell: it is built once
+    into topology_cache when the cost of the cell is estimated, and the simulation of the cell loads it from there
+    instead of building it again, from the cache directory if the cell runs in a worker process. If topology_cache has a
+    directory, later sweeps with the same seed load the base topologies from it as well.
+    """
+
+    def __init__(self, grid, num_sims, seed=None, topology_cache=None, **simulate_kwargs) -> None:
+        self.grid = grid
+        self.num_sims = num_sims
+        self.entropy = np.random.SeedSequence(seed).entropy
+        self.topology_cache = topology_cache or TopologyCache()
+        # Passed on to Simulation.simulate for every cell, such as percolation=True
+        self.simulate_kwargs = simulate_kwargs
+
+    def get_cell_seed(self, simulation_class, params):
+        """
+        Returns the seed of the simulation of a cell, which also seeds its base topology.
+        """
+        name = zlib.crc32(simulation_class.__name__.encode())
+        return [self.entropy, name] + [int(param) % 2 ** 32 for param in params]
+
+    def estimate_cost(self, simulation_class, params, topology_cache):
+        """
+        Returns an estimate of how long a cell takes to run, proportional to the number of nodes and links the cell's
+        simulations run on. Creating the simulation builds its base topology, which also adds it to the topology cache
+        for the run of the cell.
+        For a randomized topology, the first random topology stands in for all of them.
+        """
+        simulation = simulation_class(1, *params, seed=self.get_cell_seed(simulation_class, params),
+                                      topology_cache=topology_cache)
+        graph = simulation.topology.get_compact_graph()
+        return self.num_sims * (len(graph) + graph.num_edges())
+
+    def get_cells(self, topology_cache):
+        """
+        Returns the (name, simulation class, parameters) of every cell, from the most to the least costly, so that the
+        largest cells start first and no large cell is left running on its own at the end of the sweep.
+        """
+        costs = [self.estimate_cost(simulation_class, params, topology_cache) for simulation_class, params in self.grid]
+        order = sorted(range(len(self.grid)), key=lambda i: costs[i], reverse=True)
+        return [(get_cell_name(*self.grid[i]),) + tuple(self.grid[i]) for i in order]
+
+    def run(self, workers=1, output_directory=None):
+        """
+        Runs every cell of the sweep on up to workers processes, with each cell running in a single process, and
+        reports when each cell is done. Returns a dictionary mapping the name of every cell to its results in the form
+        returned by Simulation.get_results.
+
+        If output_directory is given, the results of every cell are streamed to a subdirectory named after the cell,
+        and are returned as memory mapped arrays.
+        """
+        start_time = time.time()
+        with contextlib.ExitStack() as stack:
+            topology_cache = self.topology_cache
+            if workers > 1 and topology_cache.directory is None:
+                # Worker processes can only share topologies that are stored on disk
+                directory = stack.enter_context(tempfile.TemporaryDirectory())
+                topology_cache = TopologyCache(directory, topology_cache.memory_budget)
+            cells = self.get_cells(topology_cache)
+
+            def get_args(name, simulation_class, params):
+                cell_directory = os.path.join(output_directory, name) if output_directory is not None else None
+                return (simulation_class, params, self.num_sims, self.get_cell_seed(simulation_class, params),
+                        topology_cache, self.simulate_kwargs, cell_directory)
+
+            results = {}
+            def report(name, cell_results, seconds):
+                if cell_results is None:
+                    cell_results = load_results(os.path.join(output_directory, name))
+                results[name] = cell_results
+                print("*** [%d/%d] %s: %d simulations in %.2fs" % (len(results), len(cells), name, self.num_sims, seconds))
+
+            if workers > 1:
+                executor = stack.enter_context(ProcessPoolExecutor(max_workers=workers))
+                futures = {executor.submit(run_cell, *get_args(*cell)): cell[0] for cell in cells}
+                for future in as_completed(futures):
+                    report(futures[future], *future.result())
+            else:
+                for cell in cells:
+                    report(cell[0], *run_cell(*get_args(*cell)))
+
+        print("*** Total Runtime: " + str(round(time.time() - start_time, 2)) + "s")
+        # Return the cells in the order of the grid
+        return {get_cell_name(*cell): results[get_cell_name(*cell)] for cell in self.grid}
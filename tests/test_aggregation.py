@@ -0,0 +1,24 @@
+"""
+Checks that the binned aggregates the visualize methods plot match the same aggregates computed in one go.
+"""
+import numpy as np
+import aggregation
+from aggregation import get_bin_edges, get_bin_indices, binned_quantiles
+
+def test_binned_quantiles_match_np_quantile_across_chunks(monkeypatch):
+    monkeypatch.setattr(aggregation, "CHUNK_SIZE", 1000)
+    rng = np.random.default_rng(0)
+    # No points fall in the bins above 0.9, which must stay empty
+    x = rng.random(10000) * 0.9
+    y = rng.integers(0, 50, size=len(x))
+    edges = get_bin_edges(0, 1, 20)
+    quantiles = [0.05, 0.25, 0.5, 0.75, 0.95]
+
+    counts, result = binned_quantiles(x, y, edges, quantiles)
+    bins = get_bin_indices(x, edges)
+    assert np.array_equal(counts, np.bincount(bins, minlength=20))
+    for i in range(20):
+        if counts[i]:
+            assert np.allclose(result[:, i], np.quantile(y[bins == i], quantiles))
+        else:
+            assert np.isnan(result[:, i]).all()
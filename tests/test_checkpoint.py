@@ -0,0 +1,68 @@
+"""
+Checks that an interrupted run resumes to the same results as an uninterrupted one, and that a checkpointed run can
+only be resumed from a checkpoint of its own results.
+"""
+import numpy as np
+import pytest
+from result_sink import ColumnarResultSink
+from simulation import FullyConnectedTopologySimulation, ClusteredTopologySimulation
+
+class CrashingSink(ColumnarResultSink):
+    """
+    A ColumnarResultSink that raises once num_writes batches have been written to it, like an interrupted run.
+    """
+    def __init__(self, directory, num_writes) -> None:
+        super().__init__(directory, chunk_size=1)
+        self.num_writes = num_writes
+
+    def write(self, results):
+        if self.num_writes == 0:
+            raise KeyboardInterrupt
+        self.num_writes -= 1
+        super().write(results)
+
+@pytest.mark.parametrize("simulation_class, params, simulate_kwargs", [
+    (FullyConnectedTopologySimulation, (1000, 20), {}),
+    (ClusteredTopologySimulation, (1000, -1, -1), {}),
+    (FullyConnectedTopologySimulation, (1000, 20), {"percolation": True}),
+])
+def test_resume_matches_uninterrupted_run(tmp_path, simulation_class, params, simulate_kwargs):
+    directory = str(tmp_path)
+    expected = simulation_class(*params, seed=0)
+    expected.simulate(**simulate_kwargs)
+
+    # The run is interrupted while writing its third batch, after checkpointing the first two
+    with pytest.raises(KeyboardInterrupt):
+        simulation_class(*params, seed=0).simulate(result_sink=CrashingSink(directory, 2), checkpoint_interval=0,
+                                                   **simulate_kwargs)
+
+    simulation = simulation_class(*params, seed=0)
+    simulation.resume(ColumnarResultSink(directory, append=True), workers=2)
+    results = simulation.get_results()
+    for column, values in expected.get_results().items():
+        assert np.array_equal(results[column], values)
+
+def test_fresh_sink_removes_the_old_checkpoint(tmp_path):
+    directory = str(tmp_path)
+    FullyConnectedTopologySimulation(600, 20, seed=0).simulate(result_sink=ColumnarResultSink(directory),
+                                                               checkpoint_interval=0)
+    with pytest.raises(Exception, match="No checkpoint"):
+        FullyConnectedTopologySimulation(600, 20, seed=0).resume(ColumnarResultSink(directory))
+
+def test_resume_after_interrupted_first_batch(tmp_path):
+    directory = str(tmp_path)
+    expected = FullyConnectedTopologySimulation(600, 20, seed=0)
+    expected.simulate()
+
+    # An older, complete run in the same directory must not be resumed in place of the interrupted one
+    FullyConnectedTopologySimulation(600, 20, seed=1).simulate(result_sink=ColumnarResultSink(directory),
+                                                               checkpoint_interval=0)
+    with pytest.raises(KeyboardInterrupt):
+        FullyConnectedTopologySimulation(600, 20, seed=0).simulate(result_sink=CrashingSink(directory, 0),
+                                                                   checkpoint_interval=3600)
+
+    simulation = FullyConnectedTopologySimulation(600, 20, seed=0)
+    simulation.resume(ColumnarResultSink(directory, append=True))
+    results = simulation.get_results()
+    for column, values in expected.get_results().items():
+        assert np.array_equal(results[column], values)
@@ -0,0 +1,114 @@
+"""
+Randomized checks that the algorithms give the same results as the reference implementations in networkx, and that the
+incremental ones give the same results as running the plain algorithm on every failure view.
+"""
+import networkx as nx
+import numpy as np
+from algorithms.find_disconnected_components import find_num_components, find_num_components_sweep
+from algorithms.gomory_hu import gomory_hu_tree, tree_max_flow, all_pairs_max_flow
+from algorithms.max_flow import max_flow, WarmStartMaxFlow
+from algorithms.shortest_path import shortest_path, CachedShortestPathTree
+from topologies.topology import FullyConnectedTopology, ConstantTopology, ClusteredTopology
+
+def random_topology(rng):
+    """
+    Returns a random topology of a random class with between 2 and 40 nodes.
+    """
+    kind = rng.integers(3)
+    if kind == 0:
+        return FullyConnectedTopology(int(rng.integers(2, 41)), rng)
+    if kind == 1:
+        n = int(rng.integers(2, 41))
+        return ConstantTopology(n, int(rng.integers(1, n)), rng)
+    num_clusters = int(rng.integers(1, 9))
+    return ClusteredTopology(num_clusters * int(rng.integers(3, 6)), num_clusters, rng)
+
+def to_networkx(graph):
+    """
+    Returns the live links of a CompactGraph as a networkx graph with the weight of every link as its capacity.
+    """
+    nx_graph = nx.Graph()
+    nx_graph.add_nodes_from(range(len(graph)))
+    live = graph.alive if graph.alive is not None else np.ones(graph.num_edges(), dtype=bool)
+    for u, v, weight in zip(graph.rows[live].tolist(), graph.cols[live].tolist(), graph.weights[live].tolist()):
+        nx_graph.add_edge(u, v, weight=weight, capacity=weight)
+    return nx_graph
+
+def path_weight(graph, path):
+    """
+    Returns the weight of a path in a graph, checking that every link on it is live.
+    """
+    nx_graph = to_networkx(graph)
+    return sum(nx_graph[u][v]["weight"] for u, v in zip(path, path[1:]))
+
+def reference_shortest_path(nx_graph, source, sink):
+    if not nx.has_path(nx_graph, source, sink):
+        return 0
+    return nx.dijkstra_path_length(nx_graph, source, sink)
+
+def test_algorithms_match_networkx():
+    rng = np.random.default_rng(0)
+    for _ in range(300):
+        topology = random_topology(rng)
+        base = topology.get_compact_graph()
+        graph = base.with_failures(rng.random(base.num_edges()) < rng.random())
+        nx_graph = to_networkx(graph)
+        sink = int(rng.integers(1, len(graph)))
+
+        assert find_num_components(graph) == nx.number_connected_components(nx_graph)
+        assert max_flow(graph, 0, sink) == nx.maximum_flow_value(nx_graph.to_directed(), 0, sink)
+        path, weight = shortest_path(graph, 0, sink)
+        assert weight == reference_shortest_path(nx_graph, 0, sink)
+        if path:
+            assert path[0] == 0 and path[-1] == sink and path_weight(graph, path) == weight
+
+def test_percolation_sweep_matches_find_num_components():
+    rng = np.random.default_rng(3)
+    for _ in range(30):
+        base = random_topology(rng).get_compact_graph()
+        order = rng.permutation(base.num_edges())
+        num_components_after = find_num_components_sweep(base, order)
+        for k in rng.integers(0, base.num_edges() + 1, size=5):
+            failed = np.ones(base.num_edges(), dtype=bool)
+            failed[order[:k]] = False
+            assert num_components_after[k] == find_num_components(base.with_failures(failed))
+
+def test_gomory_hu_tree_matches_max_flow_between_every_pair():
+    rng = np.random.default_rng(4)
+    for _ in range(40):
+        base = random_topology(rng).get_compact_graph()
+        graph = base.with_failures(rng.random(base.num_edges()) < rng.random())
+        parent, weight = gomory_hu_tree(graph)
+        assert parent[0] == -1
+        for u in range(len(graph)):
+            for v in range(u + 1, len(graph)):
+                assert tree_max_flow(parent, weight, u, v) == max_flow(graph, u, v)
+        # Both ways of reading the tree agree on every pair, including a node and itself
+        flows = all_pairs_max_flow(parent, weight)
+        assert all(flows[u][v] == tree_max_flow(parent, weight, u, v)
+                   for u in range(len(graph)) for v in range(len(graph)))
+        assert all(flows[u][u] == 0 for u in range(len(graph)))
+
+def test_warm_start_max_flow_matches_max_flow():
+    rng = np.random.default_rng(1)
+    for _ in range(30):
+        base = random_topology(rng).get_compact_graph()
+        sink = int(rng.integers(1, len(base)))
+        warm_start = WarmStartMaxFlow(base, 0, sink)
+        # Low failure rates exercise the warm start, high ones the fallback to a cold start
+        for rate in rng.choice([0.01, 0.05, 0.1, 0.3, 0.7], size=90):
+            failed = rng.random(base.num_edges()) < rate
+            assert warm_start.max_flow(failed) == max_flow(base.with_failures(failed), 0, sink)
+
+def test_cached_shortest_path_tree_matches_shortest_path():
+    rng = np.random.default_rng(2)
+    for _ in range(30):
+        base = random_topology(rng).get_compact_graph()
+        cached_tree = CachedShortestPathTree(base, 0)
+        for rate in rng.choice([0.01, 0.05, 0.1, 0.3, 0.7], size=90):
+            graph = base.with_failures(rng.random(base.num_edges()) < rate)
+            dest = int(rng.integers(1, len(base)))
+            path, weight = cached_tree.shortest_path(graph, dest)
+            assert weight == shortest_path(graph, 0, dest)[1]
+            if path:
+                assert path[0] == 0 and path[-1] == dest and path_weight(graph, path) == weight
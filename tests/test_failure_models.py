@@ -0,0 +1,70 @@
+"""
+Checks the failure rates and failure masks drawn by the failure models.
+"""
+import numpy as np
+import pytest
+from failure_models import (LinkFailureModel, NodeFailureModel, ClusterOutageModel, RingCutModel,
+                            CombinedFailureModel)
+from topologies.topology import ConstantTopology, ClusteredTopology
+
+def get_dead_nodes(topology, mask):
+    """
+    Returns whether every node of the topology lost all of its links in the failure mask.
+    """
+    rows, cols = topology.get_edges()
+    live_links = np.bincount(rows[~mask], minlength=len(topology)) + np.bincount(cols[~mask], minlength=len(topology))
+    return live_links == 0
+
+def test_rates_follow_the_truncated_normal_distribution():
+    rates = LinkFailureModel(mean=0.2, sd=0.3, low=0.1, high=0.6).sample_rates(np.random.default_rng(0), 100000)
+    assert len(rates) == 100000
+    assert rates.min() >= 0.1 and rates.max() <= 0.6
+    assert np.array_equal(rates, np.round(rates, 2))
+    # The mean of a normal distribution with mean 0.2 and sd 0.3 truncated to [0.1, 0.6] is about 0.318
+    assert abs(rates.mean() - 0.318) < 0.005
+
+def test_links_fail_independently_at_the_rate():
+    topology = ConstantTopology(100, 10, np.random.default_rng(0))
+    rates = np.array([0.0, 0.1, 0.5, 1.0])
+    masks = LinkFailureModel().sample_masks(topology, np.repeat(rates, 100), np.random.default_rng(1))
+    assert masks.shape == (400, len(topology.get_edges()[0]))
+    assert np.allclose(masks.reshape(4, -1).mean(axis=1), rates, atol=0.01)
+
+def test_node_failures_take_down_all_their_links():
+    topology = ConstantTopology(100, 10, np.random.default_rng(0))
+    rows, cols = topology.get_edges()
+    masks = NodeFailureModel().sample_masks(topology, np.full(50, 0.1), np.random.default_rng(1))
+    assert masks.any()
+    for mask in masks:
+        # A link only fails along with one of its nodes, which then has no links left
+        dead = get_dead_nodes(topology, mask)
+        assert np.array_equal(mask, dead[rows] | dead[cols])
+
+def test_cluster_outages_and_ring_cuts():
+    topology = ClusteredTopology(60, 6, np.random.default_rng(0))
+    rows, cols = topology.get_edges()
+    clusters = topology.get_clusters()
+    centroids = np.arange(0, 60, 10)
+    rng = np.random.default_rng(1)
+
+    for mask in ClusterOutageModel().sample_masks(topology, np.full(50, 0.3), rng):
+        # Every cluster either loses the links of all of its nodes or of none of them
+        dead = get_dead_nodes(topology, mask)
+        dead_per_cluster = np.bincount(clusters, weights=dead)
+        assert np.isin(dead_per_cluster, [0, 10]).all()
+        assert np.array_equal(mask, dead[rows] | dead[cols])
+
+    ring = np.isin(rows, centroids) & np.isin(cols, centroids)
+    masks = RingCutModel().sample_masks(topology, np.full(50, 0.5), rng)
+    assert masks[:, ring].any() and not masks[:, ~ring].any()
+
+    # A combined model fails no link at a rate of 0, and every link that any of its models fails at a rate of 1
+    masks = CombinedFailureModel([LinkFailureModel(), RingCutModel()]).sample_masks(topology, np.full(50, 0.0), rng)
+    assert not masks.any()
+    masks = CombinedFailureModel([NodeFailureModel(), RingCutModel()]).sample_masks(topology, np.full(50, 1.0), rng)
+    assert masks.all()
+
+def test_cluster_models_need_clusters():
+    topology = ConstantTopology(20, 4, np.random.default_rng(0))
+    with pytest.raises(Exception, match="clusters"):
+        RingCutModel().sample_masks(topology, np.full(1, 0.5), np.random.default_rng(1))
@@ -0,0 +1,87 @@
+"""
+Checks the online statistics against the same statistics computed over all values at once, and that iter_simulate
+yields the same results as simulate.
+"""
+import numpy as np
+from online_stats import RunningStats, BinnedRunningStats, QuantileSketch, BinnedHistogram, OnlineSummary
+from simulation import FullyConnectedTopologySimulation
+
+def test_running_stats_match_numpy():
+    rng = np.random.default_rng(0)
+    values = rng.normal(5, 2, size=10000)
+    stats, other = RunningStats(), RunningStats()
+    for chunk in np.array_split(values[:6000], 7):
+        stats.add(chunk)
+    other.add(values[6000:])
+    stats.merge(other)
+    assert stats.count == len(values)
+    assert np.isclose(stats.mean, values.mean())
+    assert np.isclose(stats.variance(), values.var(ddof=1))
+
+    binned = BinnedRunningStats(4)
+    keys = rng.random(len(values))
+    binned.add(keys, values)
+    bins = np.minimum((keys * 4).astype(int), 3)
+    assert np.array_equal(binned.counts(), np.bincount(bins))
+    assert np.allclose(binned.means(), [values[bins == i].mean() for i in range(4)])
+
+def test_quantile_sketch():
+    rng = np.random.default_rng(0)
+    quantiles = [0.05, 0.25, 0.5, 0.75, 0.95]
+
+    # Integer results with fewer distinct values than centroids give the exact quantiles
+    values = rng.integers(0, 50, size=20000)
+    sketch, other = QuantileSketch(), QuantileSketch()
+    sketch.add(values[:5000])
+    other.add(values[5000:])
+    sketch.merge(other)
+    assert sketch.exact
+    assert np.allclose(sketch.quantile(quantiles), np.quantile(values, quantiles))
+
+    # Otherwise every quantile is off by at most about 1 / max_centroids in rank
+    values = rng.normal(size=20000)
+    sketch = QuantileSketch(100)
+    for chunk in np.array_split(values, 20):
+        sketch.add(chunk)
+    assert not sketch.exact and sketch.count() == len(values)
+    ranks = np.searchsorted(np.sort(values), sketch.quantile(quantiles)) / len(values)
+    assert np.abs(ranks - quantiles).max() <= 0.02
+
+def test_histograms_fit_the_values_of_each_metric():
+    rng = np.random.default_rng(0)
+    keys = rng.random(20000)
+    values = rng.integers(-1, 1000, size=20000)
+    histogram, other = BinnedHistogram(2), BinnedHistogram(2)
+    histogram.add(keys[:100], values[:100] // 100)
+    other.add(keys[100:], values[100:])
+    histogram.merge(other)
+    # Values up to 999 need bins of width 16 to fit, and every value is counted in the bin it falls in
+    assert histogram.value_edges[0] == -1.5 and histogram.get_width() == 16
+    values[:100] //= 100
+    for key_bin in range(2):
+        in_bin = (keys >= 0.5) == key_bin
+        assert np.array_equal(histogram.counts[key_bin], np.histogram(values[in_bin], histogram.value_edges)[0])
+
+    # Each metric of a summary gets its own edges, so a large max flow isn't lumped into the last bin
+    summary = OnlineSummary(2)
+    summary.add({"link_failure": keys[:1000], "disconnected_components": values[:1000] % 5,
+                 "max_flow": values[:1000] + 200, "shortest_path": values[:1000] % 7})
+    assert summary.histograms["disconnected_components"].get_width() == 1
+    assert summary.histograms["max_flow"].value_edges[-1] > 1199
+    assert summary.to_dict()["max_flow"]["bin_histogram_edges"] == summary.histograms["max_flow"].value_edges.tolist()
+
+def test_iter_simulate_matches_simulate():
+    expected = FullyConnectedTopologySimulation(600, 20, seed=0)
+    expected.simulate()
+    expected_results = expected.get_results()
+
+    summary = OnlineSummary()
+    records = list(FullyConnectedTopologySimulation(600, 20, seed=0).iter_simulate(workers=2, summary=summary))
+    assert len(records) == 600
+    for column, values in expected_results.items():
+        assert np.array_equal([getattr(record, column) for record in records], values)
+
+    assert summary.stats["max_flow"].count == 600
+    assert np.isclose(summary.stats["max_flow"].mean, expected_results["max_flow"].mean())
+    assert summary.sketches["shortest_path"].quantile(0.5) == np.median(expected_results["shortest_path"])
+    assert summary.histograms["disconnected_components"].counts.sum() == 600
@@ -0,0 +1,46 @@
+"""
+Checks that importance sampling estimates rare event probabilities that are known exactly.
+"""
+import numpy as np
+import pytest
+from rare_events import ImportanceSampler, get_event_score, DISCONNECTION, COMPONENTS
+from topologies.compact_graph import CompactGraph
+
+# A ring of 4 nodes with two link disjoint paths of 2 links each between nodes 0 and 2
+RING = CompactGraph.from_edges(4, [1, 2, 3, 3], [0, 1, 2, 0], [1, 1, 1, 1])
+
+def test_likelihood_ratios_weight_samples_to_the_failure_rate():
+    # Without fitting, every link is sampled at a rate far from the failure rate, and the weights have to undo that
+    score, target = get_event_score(DISCONNECTION, 0, 2)
+    sampler = ImportanceSampler(RING, 0.1, score, target)
+    sampler.rates = np.array([0.5, 0.3, 0.6, 0.2])
+    estimate = sampler.estimate(np.random.default_rng(0), 20000)
+    exact = (1 - 0.9 ** 2) ** 2
+    assert abs(estimate.probability - exact) <= estimate.confidence_interval
+
+def test_fitted_sampler_estimates_rare_disconnection():
+    failure_rate = 0.01
+    score, target = get_event_score(DISCONNECTION, 0, 2)
+    sampler = ImportanceSampler(RING, failure_rate, score, target)
+    rng = np.random.default_rng(0)
+    assert sampler.fit(rng, 1000)
+    estimate = sampler.estimate(rng, 5000)
+
+    exact = (1 - (1 - failure_rate) ** 2) ** 2
+    assert abs(estimate.probability - exact) <= estimate.confidence_interval
+    # Plain simulations would need far more samples for the same precision
+    assert estimate.variance_reduction > 10
+
+def test_components_event_and_invalid_rates():
+    # The ring falls apart into 3 components only if at least 3 of its 4 links fail
+    score, target = get_event_score(COMPONENTS, threshold=3)
+    sampler = ImportanceSampler(RING, 0.05, score, target)
+    rng = np.random.default_rng(1)
+    sampler.fit(rng, 1000)
+    estimate = sampler.estimate(rng, 5000)
+    exact = 4 * 0.05 ** 3 * 0.95 + 0.05 ** 4
+    assert abs(estimate.probability - exact) <= estimate.confidence_interval
+
+    for failure_rate in [0, 0.995, 1]:
+        with pytest.raises(Exception, match="failure rate"):
+            ImportanceSampler(RING, failure_rate, score, target)
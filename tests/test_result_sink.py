@@ -0,0 +1,51 @@
+"""
+Checks that results streamed to a ColumnarResultSink are read back unchanged as memory mapped arrays.
+"""
+import numpy as np
+from result_sink import ColumnarResultSink, load_results, RESULT_COLUMNS
+from simulation import FullyConnectedTopologySimulation
+
+def make_results(start, k):
+    """
+    Returns the results of k made up simulations in the form returned by Simulation.run_batch.
+    """
+    values = list(range(start, start + k))
+    return {"link_failure": [value / 100 for value in values], "disconnected_components": values,
+            "max_flow": values, "shortest_path": values, "num_nodes": values}
+
+def test_sink_round_trips_simulation_results(tmp_path):
+    directory = str(tmp_path)
+    expected = FullyConnectedTopologySimulation(600, 20, seed=0)
+    expected.simulate(destinations=3)
+    # A chunk size that doesn't divide the batches flushes partial batches
+    simulation = FullyConnectedTopologySimulation(600, 20, seed=0)
+    simulation.simulate(result_sink=ColumnarResultSink(directory, chunk_size=100), destinations=3)
+
+    results = load_results(directory)
+    expected_results = expected.get_results()
+    assert results.keys() == expected_results.keys()
+    for column, values in expected_results.items():
+        assert isinstance(results[column], np.memmap)
+        assert results[column].dtype == values.dtype
+        assert np.array_equal(results[column], values)
+
+def test_append_and_truncate(tmp_path):
+    directory = str(tmp_path)
+    sink = ColumnarResultSink(directory, chunk_size=10)
+    sink.write(make_results(0, 25))
+    sink.close()
+
+    sink = ColumnarResultSink(directory, append=True)
+    assert sink.num_rows == 25
+    sink.write(make_results(25, 10))
+    sink.flush()
+    sink.truncate(30)
+    # Rows that are still buffered are discarded by truncate as well
+    sink.write(make_results(100, 5))
+    sink.truncate(30)
+    results = sink.read()
+    for column in RESULT_COLUMNS:
+        assert np.array_equal(results[column], np.asarray(make_results(0, 30)[column], dtype=RESULT_COLUMNS[column]))
+
+    # Opening the directory without append starts over
+    assert len(ColumnarResultSink(directory).read()["max_flow"]) == 0
@@ -0,0 +1,39 @@
+"""
+Checks that graphs published to a SharedTopologyStore are read back unchanged, in this process and in other ones.
+"""
+import numpy as np
+import pytest
+from concurrent.futures import ProcessPoolExecutor
+from algorithms.max_flow import max_flow
+from topologies.shared_store import SharedTopologyStore, SHARED_ARRAYS, attach
+from topologies.topology import ConstantTopology
+
+def max_flow_of_shared_graph(handle, sink):
+    return max_flow(attach(handle), 0, sink)
+
+def test_attached_graph_matches_published_graph():
+    graph = ConstantTopology(80, 6, np.random.default_rng(0)).get_compact_graph()
+    view = graph.with_failures(np.random.default_rng(1).random(graph.num_edges()) < 0.3)
+    with SharedTopologyStore() as store:
+        for published in [graph, view]:
+            handle = store.publish(published)
+            attached = attach(handle)
+            assert len(attached) == len(published)
+            for name in SHARED_ARRAYS:
+                expected = getattr(published, name)
+                if expected is None:
+                    assert getattr(attached, name) is None
+                else:
+                    assert np.array_equal(getattr(attached, name), expected)
+                    assert not getattr(attached, name).flags.writeable
+            assert max_flow(attached, 0, 79) == max_flow(published, 0, 79)
+            # Dropping the attached graph closes its view of the shared memory before the store frees it
+            del attached
+
+        with ProcessPoolExecutor(max_workers=2) as executor:
+            flows = list(executor.map(max_flow_of_shared_graph, [handle] * 4, range(1, 5)))
+        assert flows == [max_flow(view, 0, sink) for sink in range(1, 5)]
+
+    # Closing the store frees the shared memory
+    with pytest.raises(FileNotFoundError):
+        attach(handle)
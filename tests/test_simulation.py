@@ -0,0 +1,62 @@
+"""
+Checks that the results of a simulation only depend on its seed, not on how many worker processes run it, that
+every result column keeps one row per simulation across runs, and that adaptive runs bin the failure rates they draw.
+"""
+import numpy as np
+import pytest
+from failure_models import LinkFailureModel
+from result_sink import ColumnarResultSink
+from simulation import FullyConnectedTopologySimulation, ClusteredTopologySimulation
+
+# (simulation class, constructor parameters, simulate arguments) of a fixed topology, a randomized topology and a
+# percolation run, each with more than one batch of simulations
+SIMULATIONS = [
+    (FullyConnectedTopologySimulation, (600, 20), {}),
+    (ClusteredTopologySimulation, (600, -1, -1), {}),
+    (FullyConnectedTopologySimulation, (600, 20), {"percolation": True}),
+]
+
+def assert_same_results(results, expected):
+    assert results.keys() == expected.keys()
+    for column, values in expected.items():
+        assert np.array_equal(results[column], values)
+
+@pytest.mark.parametrize("simulation_class, params, simulate_kwargs", SIMULATIONS)
+def test_results_do_not_depend_on_workers(simulation_class, params, simulate_kwargs):
+    expected = simulation_class(*params, seed=0)
+    expected.simulate(workers=1, **simulate_kwargs)
+    simulation = simulation_class(*params, seed=0)
+    simulation.simulate(workers=3, **simulate_kwargs)
+    assert_same_results(simulation.get_results(), expected.get_results())
+
+    # A second run draws new samples, in the same way for any number of workers
+    expected.simulate(workers=1, **simulate_kwargs)
+    simulation.simulate(workers=2, **simulate_kwargs)
+    assert_same_results(simulation.get_results(), expected.get_results())
+    link_failure = expected.get_results()["link_failure"]
+    assert not np.array_equal(link_failure[:600], link_failure[600:])
+
+@pytest.mark.parametrize("use_sink", [False, True])
+def test_runs_must_record_the_same_matrix_columns(tmp_path, use_sink):
+    result_sink = ColumnarResultSink(str(tmp_path)) if use_sink else None
+    simulation = FullyConnectedTopologySimulation(300, 20, seed=0)
+    simulation.simulate(destinations=3, result_sink=result_sink)
+    for simulate_kwargs in [{}, {"destinations": 5}, {"all_pairs_max_flow": True}]:
+        with pytest.raises(Exception, match="same paths and Gomory-Hu trees"):
+            simulation.simulate(**simulate_kwargs)
+
+    # The rejected runs stored nothing, so another run like the first lines up with it
+    simulation.simulate(destinations=3)
+    results = simulation.get_results()
+    assert all(len(values) == 600 for values in results.values())
+    assert results["path_distances"].shape == (600, 3)
+
+def test_adaptive_run_bins_the_rates_of_a_truncated_failure_model():
+    # With bins over [0, 1] the bins above a rate of 0.3 would never get a result and the run could never converge
+    simulation = FullyConnectedTopologySimulation(20000, 20, seed=0)
+    failure_model = LinkFailureModel(mean=0.2, sd=0.1, low=0.1, high=0.3)
+    assert simulation.simulate_adaptive(0.5, num_bins=4, failure_model=failure_model)
+    for stats in simulation.binned_stats.values():
+        assert (stats.low, stats.high) == (0.1, 0.3)
+        assert (stats.counts() >= 30).all()
+        assert stats.counts().sum() < 20000
@@ -0,0 +1,80 @@
+"""
+Checks that a TopologyCache returns the topologies the simulations would have built themselves, evicts the least
+recently used ones from memory, reloads them from disk and holds no more than it accounts for.
+"""
+import os
+import re
+import numpy as np
+from topologies.cache import TopologyCache, get_key, CACHED_ARRAYS
+from topologies.topology import ConstantTopology, ClusteredTopology
+from simulation import ConstantTopologySimulation
+
+def assert_same_graph(graph, expected):
+    assert len(graph) == len(expected)
+    for name in CACHED_ARRAYS:
+        assert np.array_equal(getattr(graph, name), getattr(expected, name))
+
+def test_cached_topology_matches_built_topology(tmp_path):
+    cache = TopologyCache(str(tmp_path))
+    topology = cache.get(ClusteredTopology, (60, 6), 7)
+    expected = ClusteredTopology(60, 6, np.random.default_rng(7))
+    assert_same_graph(topology.get_compact_graph(), expected.get_compact_graph())
+    assert topology.get_clusters().max() == 5
+
+    simulation = ConstantTopologySimulation(100, 50, 4, seed=3)
+    simulation.simulate()
+    cached_simulation = ConstantTopologySimulation(100, 50, 4, seed=3, topology_cache=cache)
+    cached_simulation.simulate()
+    for column, values in simulation.get_results().items():
+        assert np.array_equal(cached_simulation.get_results()[column], values)
+
+def test_least_recently_used_topology_is_evicted(tmp_path):
+    one_topology = ConstantTopology(50, 4, np.random.default_rng(0)).get_compact_graph().nbytes()
+    cache = TopologyCache(str(tmp_path), memory_budget=2 * one_topology)
+    keys = [get_key(ConstantTopology, (50, 4), seed) for seed in range(3)]
+    cache.get(ConstantTopology, (50, 4), 0)
+    cache.get(ConstantTopology, (50, 4), 1)
+    cache.get(ConstantTopology, (50, 4), 0)
+    cache.get(ConstantTopology, (50, 4), 2)
+    assert list(cache.entries) == [keys[0], keys[2]]
+
+    # The evicted topology is loaded from disk, memory mapped, instead of being generated again
+    reloaded = cache.get(ConstantTopology, (50, 4), 1).get_compact_graph()
+    assert isinstance(reloaded.rows, np.memmap)
+    assert_same_graph(reloaded, ConstantTopology(50, 4, np.random.default_rng(1)).get_compact_graph())
+
+def test_disk_tier_is_shared_between_caches(tmp_path):
+    TopologyCache(str(tmp_path)).get(ConstantTopology, (50, 4), 0)
+    cache = TopologyCache(str(tmp_path))
+    # A topology class that fails to build shows that the topology comes from disk
+    class Unbuildable(ConstantTopology):
+        def __init__(self, *args, **kwargs):
+            raise AssertionError("the topology should have been loaded from disk")
+    Unbuildable.__name__ = ConstantTopology.__name__
+    topology = cache.get(Unbuildable, (50, 4), 0)
+    expected = ConstantTopology(50, 4, np.random.default_rng(0))
+    assert_same_graph(topology.get_compact_graph(), expected.get_compact_graph())
+
+def test_algorithms_do_not_grow_cached_graphs():
+    cache = TopologyCache()
+    for _ in range(2):
+        graph = cache.get(ConstantTopology, (50, 4), 0).get_compact_graph()
+        graph.with_failures(np.zeros(graph.num_edges(), dtype=bool)).get_adjacency()
+        assert graph.all_adjacency is not None
+    # The adjacency lists were built on the returned copies, so the cache still only holds the arrays it accounts for
+    cached = cache.entries[get_key(ConstantTopology, (50, 4), 0)]
+    assert cached.all_adjacency is None and cached.adjacency is None
+    assert cache.memory_used == cached.nbytes()
+
+def test_keys_are_safe_directory_names(tmp_path):
+    # Sweeps seed every cell with a list, which the simulation turns into a SeedSequence with a spawn key
+    seeds = [7, [12, 3, 50], np.random.SeedSequence([12, 3, 50], spawn_key=(0, 1)), np.random.SeedSequence()]
+    keys = [get_key(ConstantTopology, (50, 4), seed) for seed in seeds]
+    assert all(re.fullmatch(r"[A-Za-z0-9_.-]+", key) for key in keys)
+    assert len(set(keys)) == len(keys)
+    # Seeds that give the same random numbers share a key
+    assert get_key(ConstantTopology, (50, 4), np.random.SeedSequence([12, 3, 50])) == keys[1]
+
+    cache = TopologyCache(str(tmp_path))
+    cache.get(ConstantTopology, (50, 4), seeds[2])
+    assert os.listdir(str(tmp_path)) == [keys[2]]
@@ -0,0 +1,113 @@
+import copy
+import os
+import shutil
+from collections import OrderedDict
+import numpy as np
+from topologies.compact_graph import CompactGraph
+
+# Default number of bytes the in-memory tier of a TopologyCache may hold
+DEFAULT_MEMORY_BUDGET = 256 * 1024 * 1024
+
+# Arrays of a compact graph that are stored on disk, each in its own .npy file
+CACHED_ARRAYS = ["rows", "cols", "weights", "indptr", "indices", "edge_ids"]
+
+class TopologyCache():
+    """
+    A class to represent a cache of generated topologies, keyed by the topology class, the parameters passed to its
+    constructor and the seed of the random number generator it was built with.
+
+    The cache has two tiers. The in-memory tier keeps the compact graphs of recently used topologies until they take up
+    more than memory_budget bytes, evicting the least recently used first. If a directory is given, every topology is
+    also stored there as the .npy files of the arrays of its compact graph, which are memory mapped when loaded, so that
+    other runs and processes can skip generating it as well without rebuilding or copying anything.
+    """
+
+    def __init__(self, directory=None, memory_budget=DEFAULT_MEMORY_BUDGET) -> None:
+        self.directory = directory
+        self.memory_budget = memory_budget
+        self.entries = OrderedDict()
+        self.memory_used = 0
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def __getstate__(self):
+        # Only the on-disk tier is shared when the cache is sent to another process
+        state = self.__dict__.copy()
+        state["entries"] = OrderedDict()
+        state["memory_used"] = 0
+        return state
+
+    def get(self, topology_class, params, seed):
+        """
+        Returns the topology built by topology_class(*params, rng=np.random.default_rng(seed)), generating it only if
+        it isn't cached yet. params start with the number of nodes, like every Topology constructor. seed is an int or a
+        numpy.random.SeedSequence. Every call returns a new topology object with its own copy of the cached compact
+        graph, which shares the arrays but not the adjacency lists algorithms build on it, so neither changing the
+        topology nor running algorithms on it grows or changes the cache.
+        """
+        key = get_key(topology_class, params, seed)
+
+        compact_graph = self.entries.get(key)
+        if compact_graph is not None:
+            self.entries.move_to_end(key)
+            return topology_class.from_compact_graph(copy.copy(compact_graph), params=params)
+
+        compact_graph = self.load(key, params[0])
+        if compact_graph is None:
+            compact_graph = topology_class(*params, rng=np.random.default_rng(seed)).get_compact_graph()
+            self.save(key, compact_graph)
+        self.add_to_memory(key, compact_graph)
+        return topology_class.from_compact_graph(copy.copy(compact_graph), params=params)
+
+    def add_to_memory(self, key, compact_graph):
+        """
+        Adds a compact graph to the in-memory tier and evicts the least recently used ones that go over the budget.
+        """
+        self.entries[key] = compact_graph
+        self.memory_used += compact_graph.nbytes()
+        while self.memory_used > self.memory_budget and len(self.entries) > 1:
+            _, evicted = self.entries.popitem(last=False)
+            self.memory_used -= evicted.nbytes()
+
+    def path(self, key):
+        return os.path.join(self.directory, key)
+
+    def load(self, key, n):
+        """
+        Returns the compact graph stored on disk under key, with its arrays memory mapped, or None if there is none.
+        """
+        if self.directory is None or not os.path.isdir(self.path(key)):
+            return None
+        arrays = {name: np.load(os.path.join(self.path(key), name + ".npy"), mmap_mode="r") for name in CACHED_ARRAYS}
+        return CompactGraph.from_arrays(n, **arrays)
+
+    def save(self, key, compact_graph):
+        """
+        Stores the arrays of a compact graph on disk in a directory named after key.
+        """
+        if self.directory is None:
+            return
+        temp_path = self.path(key) + ".tmp" + str(os.getpid())
+        os.makedirs(temp_path, exist_ok=True)
+        for name in CACHED_ARRAYS:
+            np.save(os.path.join(temp_path, name + ".npy"), getattr(compact_graph, name))
+        try:
+            os.replace(temp_path, self.path(key))
+        except OSError:
+            # Another process stored the same topology first
+            shutil.rmtree(temp_path)
+
+
+def get_key(topology_class, params, seed):
+    """
+    Returns the name a topology is cached under, which is also the name of its directory on disk, so it only holds
+    letters, digits, "_", "-" and ".". The numbers a seed is made of are joined with "-", followed by the spawn key of a
+    SeedSequence joined with ".", so that seeds that give the same random numbers get the same name.
+    """
+    spawn_key = ()
+    if isinstance(seed, np.random.SeedSequence):
+        seed, spawn_key = seed.entropy, seed.spawn_key
+    if not isinstance(seed, (list, tuple, np.ndarray)):
+        seed = [seed]
+    seed = "-".join(str(int(part)) for part in seed) + "".join("." + str(int(part)) for part in spawn_key)
+    return "_".join([topology_class.__name__] + [str(param) for param in params] + [seed])
@@ -0,0 +1,168 @@
+import copy
+import numpy as np
+
+class CompactGraph():
+    """
+    A class to represent a topology as compact arrays instead of an n x n matrix.
+
+    Every link is stored once in the edge arrays (rows, cols, weights) with rows[k] > cols[k], in the same order as
+    Topology.get_edges(). The adjacency is stored in CSR form (indptr, indices, edge_ids) with one entry per direction
+    of a link, where edge_ids maps each entry back to its link in the edge arrays. If alive is set, only the links
+    where alive is True are part of the graph.
+
+    A view of the graph with failed links (see with_failures) shares the arrays of the graph it was made from, along
+    with the adjacency lists of all of its links, which are only built once.
+    """
+    def __init__(self, n, rows, cols, weights, alive=None) -> None:
+        self.n = n
+        self.rows = np.asarray(rows, dtype=np.int32)
+        self.cols = np.asarray(cols, dtype=np.int32)
+        self.weights = np.asarray(weights, dtype=np.uint8)
+        self.alive = alive
+
+        num_edges = len(self.rows)
+        heads = np.concatenate([self.rows, self.cols])
+        order = np.argsort(heads, kind="stable")
+        self.indices = np.concatenate([self.cols, self.rows])[order]
+        self.edge_ids = np.tile(np.arange(num_edges, dtype=np.int32), 2)[order]
+        self.indptr = np.zeros(n + 1, dtype=np.int32)
+        np.cumsum(np.bincount(heads, minlength=n), out=self.indptr[1:])
+
+        self.adjacency = None
+        self.all_adjacency = None
+        self.base = None # The graph this graph is a view of, or None if it isn't a view
+
+    @classmethod
+    def from_matrix(cls, graph):
+        """
+        Creates a compact graph from a topology's adjacency matrix, ignoring the self loops on the diagonal.
+        """
+        matrix = np.asarray(graph)
+        rows, cols = np.nonzero(np.tril(matrix, -1))
+        return cls(len(matrix), rows, cols, matrix[rows, cols])
+
+    @classmethod
+    def from_arrays(cls, n, rows, cols, weights, indptr, indices, edge_ids, alive=None):
+        """
+        Creates a compact graph from the arrays of another compact graph, without copying them or rebuilding the CSR
+        arrays, such as arrays in shared memory (see topologies/shared_store.py).
+        """
+        compact_graph = cls.__new__(cls)
+        compact_graph.n = n
+        compact_graph.rows = rows
+        compact_graph.cols = cols
+        compact_graph.weights = weights
+        compact_graph.alive = alive
+        compact_graph.indptr = indptr
+        compact_graph.indices = indices
+        compact_graph.edge_ids = edge_ids
+        compact_graph.adjacency = None
+        compact_graph.all_adjacency = None
+        compact_graph.base = None
+        return compact_graph
+
+    @classmethod
+    def from_edges(cls, n, rows, cols, weights):
+        """
+        Creates a compact graph with n nodes from arrays of links given in any order and direction. Self loops are
+        dropped and a link that is given more than once keeps its last weight.
+        """
+        rows, cols, weights = np.asarray(rows), np.asarray(cols), np.asarray(weights)
+        high, low = np.maximum(rows, cols), np.minimum(rows, cols)
+        keep = high != low
+        # Sorting the links by high * n + low puts them in the same order as Topology.get_edges()
+        keys = (high[keep].astype(np.int64) * n + low[keep])[::-1]
+        keys, last = np.unique(keys, return_index=True)
+        return cls(n, keys // n, keys % n, weights[keep][::-1][last])
+
+    def __getstate__(self):
+        # The adjacency lists are rebuilt where they are needed instead of being sent to another process
+        state = self.__dict__.copy()
+        state["adjacency"] = None
+        state["all_adjacency"] = None
+        return state
+
+    def __len__(self):
+        return self.n
+
+    def num_edges(self):
+        """
+        Returns the number of links in the graph, ignoring the alive mask.
+        """
+        return len(self.rows)
+
+    def nbytes(self):
+        """
+        Returns the number of bytes taken up by the arrays of the graph.
+        """
+        return sum(array.nbytes for array in (self.rows, self.cols, self.weights, self.indptr, self.indices, self.edge_ids))
+
+    def with_failures(self, failed):
+        """
+        Returns a view of the graph without the links selected by the failure mask. The view shares its arrays with
+        this graph, so creating it only costs one pass over the mask.
+        """
+        view = copy.copy(self)
+        view.alive = ~np.asarray(failed, dtype=bool)
+        if self.alive is not None:
+            view.alive &= self.alive
+        view.adjacency = None
+        view.base = self.get_base()
+        return view
+
+    def get_base(self):
+        """
+        Returns the graph that this graph is a view of, or the graph itself if it isn't a view.
+        """
+        return self if self.base is None else self.base
+
+    def get_all_adjacency(self):
+        """
+        Returns a list holding, for every node, a list of (neighbor, weight, edge_id) tuples of all of its links,
+        ignoring the alive mask. The lists are built once for the base graph and shared by all of its views.
+        """
+        base = self.get_base()
+        if base.all_adjacency is None:
+            indptr = base.indptr.tolist()
+            indices = base.indices.tolist()
+            edge_ids = base.edge_ids.tolist()
+            weights = base.weights.tolist()
+            base.all_adjacency = [[(indices[k], weights[edge_ids[k]], edge_ids[k]) for k in range(indptr[u], indptr[u+1])]
+                                  for u in range(base.n)]
+        return base.all_adjacency
+
+    def get_adjacency(self):
+        """
+        Returns a list holding, for every node, a list of (neighbor, weight, edge_id) tuples of its live links. The
+        tuples are shared with the adjacency lists of all links (see get_all_adjacency), so a view only allocates the
+        lists that pick out its live links. The lists are built once and reused by every algorithm run on this graph.
+        """
+        if self.adjacency is None:
+            all_adjacency = self.get_all_adjacency()
+            if self.alive is None:
+                self.adjacency = all_adjacency
+            else:
+                alive = self.alive.tolist()
+                self.adjacency = [[link for link in links if alive[link[2]]] for links in all_adjacency]
+        return self.adjacency
+
+    def to_matrix(self):
+        """
+        Returns the live links of the graph as an n x n adjacency matrix with 1 on the diagonal, like Topology.graph.
+        """
+        matrix = np.eye(self.n, dtype=np.int64)
+        live = self.alive if self.alive is not None else slice(None)
+        matrix[self.rows[live], self.cols[live]] = self.weights[live]
+        matrix[self.cols[live], self.rows[live]] = self.weights[live]
+        return matrix.tolist()
+
+
+def get_adjacency(G):
+    """
+    Returns the adjacency lists of G, which is either a CompactGraph or an adjacency matrix, as a list holding a list
+    of (neighbor, weight, edge_id) tuples for every node. Self loops are ignored and for an adjacency matrix the edge_id
+    of a link is None.
+    """
+    if isinstance(G, CompactGraph):
+        return G.get_adjacency()
+    return [[(j, weight, None) for j, weight in enumerate(row) if weight > 0 and i != j] for i, row in enumerate(G)]
@@ -0,0 +1,83 @@
+from multiprocessing import shared_memory
+import numpy as np
+from topologies.compact_graph import CompactGraph
+
+# Arrays of a compact graph that are published, in the order they are laid out in shared memory
+SHARED_ARRAYS = ["rows", "cols", "weights", "indptr", "indices", "edge_ids", "alive"]
+
+# Every array starts at a multiple of this many bytes
+ALIGNMENT = 8
+
+class SharedGraphHandle():
+    """
+    A class to represent a compact graph published to shared memory by a SharedTopologyStore. It only holds the name of
+    the shared memory block and where each array is in it, so it is cheap to send to other processes, which pass it
+    to attach to get the graph.
+    """
+
+    def __init__(self, name, n, layout) -> None:
+        self.name = name
+        self.n = n
+        # (array name, dtype, length, offset in bytes) of every published array
+        self.layout = layout
+
+
+class SharedTopologyStore():
+    """
+    A class to represent compact graphs published to shared memory, so that worker processes can read them without
+    each receiving a copy. The store owns the shared memory, which is freed by close, so the store must stay open while
+    any process uses the graphs. It can be used as a context manager that closes it on exit.
+    """
+
+    def __init__(self) -> None:
+        self.blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def publish(self, compact_graph):
+        """
+        Copies the arrays of a compact graph into one new block of shared memory and returns its SharedGraphHandle.
+        """
+        arrays = [(name, getattr(compact_graph, name)) for name in SHARED_ARRAYS
+                  if getattr(compact_graph, name) is not None]
+        layout = []
+        size = 0
+        for name, array in arrays:
+            layout.append((name, array.dtype.str, len(array), size))
+            size += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+
+        block = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        self.blocks.append(block)
+        for (name, array), (_, dtype, length, offset) in zip(arrays, layout):
+            np.ndarray(length, dtype=dtype, buffer=block.buf, offset=offset)[:] = array
+        return SharedGraphHandle(block.name, len(compact_graph), layout)
+
+    def close(self):
+        """
+        Frees the shared memory of every published graph.
+        """
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+        self.blocks = []
+
+
+def attach(handle):
+    """
+    Returns the compact graph published under a SharedGraphHandle. Its arrays are read-only views of the shared memory,
+    so nothing is copied.
+    """
+    block = shared_memory.SharedMemory(name=handle.name)
+    arrays = {}
+    for name, dtype, length, offset in handle.layout:
+        array = np.ndarray(length, dtype=dtype, buffer=block.buf, offset=offset)
+        array.flags.writeable = False
+        arrays[name] = array
+    compact_graph = CompactGraph.from_arrays(handle.n, **arrays)
+    # The arrays are only valid while the block is open, so the graph keeps it
+    compact_graph.shared_memory = block
+    return compact_graph
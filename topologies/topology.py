@@ -1,30 +1,112 @@
-import random
-import networkx as nx 
-import matplotlib.pyplot as plt 
+import numpy as np
 import heapq 
+from topologies.compact_graph import CompactGraph
 
 MAX_EDGE_WEIGHT = 10
 
 class Topology():
     """
     A class to represent a topology of a network
+
+    The links are kept in self.compact_graph. The n x n adjacency matrix self.graph is only built from it when it is
+    first used, so building a topology takes time proportional to its number of links.
     """
-    graph = None
-    def __init__(self, n) -> None:
+    matrix = None
+    compact_graph = None
+    def __init__(self, n, rng=None) -> None:
         if n < 1:
             raise Exception("Number of nodes must be greater than 0")
-        self.graph = [[0 for _ in range(n)] for _ in range(n)]
-        for i in range(n):
-            self.graph[i][i] = 1
+        # Random number generator used to build the topology, pass one in to make the topology reproducible
+        self.rng = rng if rng is not None else np.random.default_rng()
+        # A topology starts out without links
+        self.compact_graph = CompactGraph(n, [], [], [])
+
+    @property
+    def graph(self):
+        """
+        The adjacency matrix of the topology as a list of lists, with 1 on the diagonal and the weight of the link
+        between i and j, or 0, at [i][j]. It is built from the compact graph the first time it is used.
+        """
+        if self.matrix is None and self.compact_graph is not None:
+            self.matrix = self.compact_graph.to_matrix()
+        return self.matrix
+
+    @graph.setter
+    def graph(self, graph):
+        self.matrix = graph
     
+    @classmethod
+    def from_compact_graph(cls, compact_graph, rng=None, params=None):
+        """
+        Creates a topology of this class with the links of a compact graph, without generating any links. params are
+        the parameters passed to the constructor when the links were generated, if they are known (see set_params).
+        """
+        topology = cls.__new__(cls)
+        Topology.__init__(topology, len(compact_graph), rng)
+        topology.compact_graph = compact_graph
+        if params is not None:
+            topology.set_params(*params)
+        return topology
+
+    def set_params(self, n, *params):
+        """
+        Keeps the constructor parameters that are still needed once the links are built. Most topologies need none.
+        """
+        pass
+
+    def __len__(self):
+        """
+        Returns the number of nodes. This also works in a worker process, where only the compact graph of a fixed
+        topology is attached (see Simulation.get_worker_copy).
+        """
+        if self.compact_graph is not None:
+            return len(self.compact_graph)
+        return len(self.matrix)
+
     def destroy_link(self, i, j):
-        self.graph[i][j] = 0
-        self.graph[j][i] = 0
+        graph = self.graph
+        graph[i][j] = 0
+        graph[j][i] = 0
+        self.compact_graph = None
+
+    def get_edges(self):
+        """
+        Returns the links of the topology as two arrays (rows, cols) of node indices where rows[k] > cols[k]. The links
+        are ordered by row and then by column.
+        """
+        compact_graph = self.get_compact_graph()
+        return compact_graph.rows, compact_graph.cols
+
+    def get_compact_graph(self):
+        """
+        Returns the topology in its current state as a CompactGraph, which the algorithms can run on in time
+        proportional to the number of links instead of the square of the number of nodes. The compact graph is built
+        once and kept until a link is destroyed, so self.graph should only be changed through destroy_link afterwards.
+        """
+        if self.compact_graph is None:
+            self.compact_graph = CompactGraph.from_matrix(self.matrix)
+        return self.compact_graph
+
+    def set_links(self, rows, cols, weights):
+        """
+        Replaces the links of the topology with the links between rows[k] and cols[k] of weight weights[k]. This builds
+        the compact graph directly from the arrays, in time proportional to the number of links. The adjacency matrix
+        is built again from the new links when it is next used.
+        """
+        self.compact_graph = CompactGraph.from_edges(len(self), rows, cols, weights)
+        self.matrix = None
 
     def get_random_edge_weight(self):
-        return random.randint(1, MAX_EDGE_WEIGHT)
+        return int(self.rng.integers(1, MAX_EDGE_WEIGHT + 1))
+
+    def get_random_edge_weights(self, k):
+        return self.rng.integers(1, MAX_EDGE_WEIGHT + 1, size=k)
 
     def visualize(self):
+        # networkx and matplotlib are only needed here and take a long time to import
+        import networkx as nx
+        import matplotlib.pyplot as plt
+
         G = nx.DiGraph()
         for i in range(len(self.graph)): 
             for j in range(len(self.graph[i])): 
@@ -39,12 +121,10 @@ class FullyConnectedTopology(Topology):
     A class to represent a fully connected topology of a network. 
     ie, all pairs of nodes are connected)
     """
-    def __init__(self, n) -> None:
-        super().__init__(n)
-        for i in range(n):
-            for j in range(i):
-                self.graph[i][j] = self.get_random_edge_weight()
-                self.graph[j][i] = self.graph[i][j]
+    def __init__(self, n, rng=None) -> None:
+        super().__init__(n, rng)
+        rows, cols = np.tril_indices(n, -1)
+        self.set_links(rows, cols, self.get_random_edge_weights(len(rows)))
 
 
 class ConstantTopology(Topology):
@@ -52,42 +132,48 @@ class ConstantTopology(Topology):
     A class to represent a topology of a network where each node has a 
     maximum constant number of links. 
     """
-    def __init__(self, n, links_per_node) -> None:
+    def __init__(self, n, links_per_node, rng=None) -> None:
         if links_per_node > n-1:
             raise Exception("Too many links for this topology")
         elif links_per_node < 1:
             raise Exception("Too few links for this topology")
 
-        super().__init__(n)
+        super().__init__(n, rng)
 
-        available = list(range(n))
-        link_heap = [(0, i) for i in available] # Heap to sort nodes by number of links
+        available = [True] * n
+        num_links = [0] * n
+        neighbors = [set() for _ in range(n)]
+        link_heap = [(0, i) for i in range(n)] # Heap to sort nodes by number of links
         heapq.heapify(link_heap)
+        rows, cols = [], []
 
         for i in range(n):
-            if i not in available:
+            if not available[i]:
                 continue
-            num_links = sum([1 for edge_weight in self.graph[i] if edge_weight > 0]) - 1
-            available.remove(i)
+            available[i] = False
 
             push_back = [] # Store the nodes that were popped from the heap but not used
-            while num_links < links_per_node and link_heap:
+            while num_links[i] < links_per_node and link_heap:
                 candidate = heapq.heappop(link_heap) # Pop the node with the fewest links
-                if candidate[1] not in available:
+                if not available[candidate[1]]:
                     continue
-                if self.graph[i][candidate[1]] == 0:
-                    edge_weight = self.get_random_edge_weight()
-                    self.graph[i][candidate[1]] = edge_weight
-                    self.graph[candidate[1]][i] = edge_weight
+                if candidate[1] not in neighbors[i]:
+                    neighbors[i].add(candidate[1])
+                    neighbors[candidate[1]].add(i)
+                    rows.append(i)
+                    cols.append(candidate[1])
+                    num_links[candidate[1]] += 1
                     if candidate[0] + 1 < links_per_node: # If the node has less than the max number of links, push it back onto the heap
                         heapq.heappush(link_heap, (candidate[0] + 1, candidate[1]))
-                    else: # Otherwise, remove it from the list of available nodes and dont push it back on the heap
-                        available.remove(candidate[1])
-                    num_links += 1
+                    else: # Otherwise, mark it as unavailable and dont push it back on the heap
+                        available[candidate[1]] = False
+                    num_links[i] += 1
                 else: # There already exists an edge between the two nodes
                     push_back.append(candidate)
             for item in push_back:
                 heapq.heappush(link_heap, item)
+
+        self.set_links(rows, cols, self.get_random_edge_weights(len(rows)))
                 
 
 class ClusteredTopology(Topology):
@@ -96,29 +182,41 @@ class ClusteredTopology(Topology):
     nodes within a given cluster are all connected to the centroid of the cluster.
     The centroids of each cluster are connected in a ring.
     """
-    def __init__(self, n, num_clusters) -> None:
+    def __init__(self, n, num_clusters, rng=None) -> None:
         if num_clusters > n:
             raise Exception("Too many clusters for this topology")
         elif n % num_clusters != 0:
             raise Exception("Number of nodes must be divisible by number of clusters")
 
-        super().__init__(n)
+        super().__init__(n, rng)
+        self.set_params(n, num_clusters)
         
         cluster_size = n // num_clusters
-        for centroid in range(0, n, cluster_size):
-            # Make an edge between the centroid and the next centroid in the ring
-            edge_weight = self.get_random_edge_weight()
-            self.graph[centroid][(centroid + cluster_size) % n] = edge_weight
-            self.graph[(centroid + cluster_size) % n][centroid] = edge_weight
-            for child in range(cluster_size): # Make an edge between the centroid and each child
-                edge_weight = self.get_random_edge_weight()
-                self.graph[centroid][centroid + child] = edge_weight
-                self.graph[centroid + child][centroid] = edge_weight
-            links_in_cluster = random.randint(0, cluster_size*(cluster_size-1)//2) # Randomly interconnect nodes in cluster
-            while links_in_cluster > 0:
-                linked_nodes = random.sample(range(cluster_size), 2)
-                if linked_nodes[0] != centroid and linked_nodes[1] != centroid:
-                    edge_weight = self.get_random_edge_weight()
-                    self.graph[centroid + linked_nodes[0]][centroid + linked_nodes[1]] = edge_weight
-                    self.graph[centroid + linked_nodes[1]][centroid + linked_nodes[0]] = edge_weight
-                    links_in_cluster -= 1
+        nodes = np.arange(n)
+        centroids = np.arange(0, n, cluster_size)
+
+        # Make an edge between each centroid and the next centroid in the ring, and between each centroid and each child
+        rows = [centroids, nodes]
+        cols = [(centroids + cluster_size) % n, nodes - nodes % cluster_size]
+
+        # Randomly interconnect the children in each cluster by picking a random number of distinct pairs of children
+        pair_i, pair_j = np.triu_indices(cluster_size - 1, 1)
+        for centroid in centroids:
+            links_in_cluster = int(self.rng.integers(0, len(pair_i) + 1))
+            linked_pairs = self.rng.choice(len(pair_i), links_in_cluster, replace=False)
+            rows.append(centroid + 1 + pair_i[linked_pairs])
+            cols.append(centroid + 1 + pair_j[linked_pairs])
+
+        rows, cols = np.concatenate(rows), np.concatenate(cols)
+        self.set_links(rows, cols, self.get_random_edge_weights(len(rows)))
+
+    def set_params(self, n, num_clusters):
+        self.num_clusters = num_clusters
+        self.cluster_size = n // num_clusters
+
+    def get_clusters(self):
+        """
+        Returns the index of the cluster of every node. Cluster c holds the nodes from c * cluster_size up to the next
+        cluster, and its first node is its centroid.
+        """
+        return np.arange(len(self)) // self.cluster_size